@@ -0,0 +1,166 @@
+import csv
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import degrees
+from graph import build_landmarks
+from util import SearchStats
+
+PAIRS = 100
+PEOPLE = 20000
+MOVIES = 10000
+STARS_PER_MOVIE = 4
+LANDMARKS = 16
+
+
+def main():
+    if len(sys.argv) > 3:
+        sys.exit("Usage: python benchmark_degrees.py [directory] [pairs]")
+    pairs = int(sys.argv[2]) if len(sys.argv) == 3 else PAIRS
+
+    with tempfile.TemporaryDirectory() as scratch:
+        if len(sys.argv) >= 2:
+            directory = sys.argv[1]
+        else:
+            directory = scratch
+            print(f"Generating synthetic dataset ({PEOPLE} people, "
+                  f"{MOVIES} movies)...")
+            generate(directory, PEOPLE, MOVIES, STARS_PER_MOVIE)
+
+        print("Loading data...")
+        measure_load(directory)
+        if degrees.landmarks is None:
+            start = time.perf_counter()
+            degrees.landmarks = build_landmarks(degrees.graph, LANDMARKS)
+            print(f"Built {LANDMARKS} landmarks in "
+                  f"{time.perf_counter() - start:.2f} s.")
+
+        measure_expansion(random_pairs(pairs))
+        compare_searches(random_pairs(pairs))
+
+
+def generate(directory, people, movies, stars_per_movie, seed=0):
+    """
+    Write a synthetic people.csv, movies.csv and stars.csv to `directory`.
+
+    Casting is skewed towards low person ids, so that like the IMDb data
+    a few people star in many movies and most people star in a few.
+    """
+    rng = random.Random(seed)
+    with open(os.path.join(directory, "people.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "name", "birth"])
+        for i in range(people):
+            writer.writerow([i, f"Person {i}", 1900 + i % 100])
+
+    with open(os.path.join(directory, "movies.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["id", "title", "year"])
+        for i in range(movies):
+            writer.writerow([i, f"Movie {i}", 1900 + i % 120])
+
+    with open(os.path.join(directory, "stars.csv"), "w",
+              encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["person_id", "movie_id"])
+        for movie in range(movies):
+            cast = {int(people * rng.random() ** 2)
+                    for _ in range(stars_per_movie)}
+            for person in cast:
+                writer.writerow([person, movie])
+
+
+def measure_load(directory):
+    """
+    Loads `directory` into degrees, printing the load time
+    and the memory held by the loaded data.
+    """
+    tracemalloc.start()
+    start = time.perf_counter()
+    degrees.load_data(directory)
+    elapsed = time.perf_counter() - start
+    held, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"Data loaded in {elapsed:.2f} s: {held / 2 ** 20:.1f} MiB held, "
+          f"{peak / 2 ** 20:.1f} MiB peak.")
+
+
+def random_pairs(n, seed=1):
+    """Returns `n` random (source, target) pairs of loaded person ids."""
+    rng = random.Random(seed)
+    person_ids = degrees.graph.person_ids
+    return [(rng.choice(person_ids), rng.choice(person_ids))
+            for _ in range(n)]
+
+
+def run(search, pairs):
+    """
+    Answers every pair with `search`.
+    Returns the path lengths, node expansions and wall time.
+    """
+    lengths = []
+    expansions = 0
+    start = time.perf_counter()
+    for source, target in pairs:
+        stats = SearchStats()
+        path = search(source, target, stats)
+        lengths.append(None if path is None else len(path))
+        expansions += stats.expanded
+    return lengths, expansions, time.perf_counter() - start
+
+
+def measure_expansion(pairs):
+    """
+    Prints how many people per second can be expanded by building the set
+    of (movie, person) neighbor pairs and unpacking each one with list(),
+    as shortest_path used to, against the lazy unseen neighbor generator.
+    """
+    graph = degrees.graph
+    people = [graph.person(source) for source, _ in pairs]
+
+    start = time.perf_counter()
+    for person in people:
+        explored = set()
+        for item in set(graph.neighbors(person)):
+            if list(item)[1] not in explored:
+                explored.add(list(item)[1])
+                list(item)[0]
+    eager = len(people) / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    for person in people:
+        reached = set()
+        for movie, neighbor in graph.unseen_neighbors(person, reached, set()):
+            reached.add(neighbor)
+    lazy = len(people) / (time.perf_counter() - start)
+
+    print(f"{'set of pairs':>16}: {eager:>10.0f} expansions/s")
+    print(f"{'generator':>16}: {lazy:>10.0f} expansions/s")
+
+
+def compare_searches(pairs):
+    """Prints expansions and wall time of each search over the same pairs."""
+    results = dict()
+    for name, search in [
+        ("unidirectional", degrees.shortest_path),
+        ("bidirectional", degrees.bidirectional_shortest_path),
+        ("landmarks", degrees.landmark_shortest_path)
+    ]:
+        lengths, expansions, elapsed = run(search, pairs)
+        results[name] = lengths
+        print(f"{name:>16}: {expansions:>10} expansions  "
+              f"{elapsed:8.3f} s  ({expansions / elapsed:.0f} expansions/s, "
+              f"{len(pairs)} pairs)")
+
+    if len(set(map(tuple, results.values()))) > 1:
+        sys.exit("Searches disagree on path lengths.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import argparse
+import csv
+import random
+import sys
+import time
+
+import puzzle
+from logic import *
+
+# Largest number of symbols each exhaustive backend is timed on
+LIMITS = {
+    "enumerate": 14,
+    "parallel": 14,
+    "compiled": 20,
+    "numpy": 24
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the entailment backends of logic.py"
+    )
+    parser.add_argument("seed", nargs="?", type=int, default=0)
+    parser.add_argument("--csv", metavar="FILE",
+                        help="also write each backend's timings to FILE")
+    args = parser.parse_args()
+    rng = random.Random(args.seed)
+    rows = []
+
+    print("Simplification (nodes before -> after, "
+          "clauses by distribution / Tseitin)")
+    puzzles = [("knowledge0", puzzle.knowledge0),
+               ("knowledge1", puzzle.knowledge1),
+               ("knowledge2", puzzle.knowledge2),
+               ("knowledge3", puzzle.knowledge3),
+               ("20 people", puzzle.generate(20, seed=0)[0])]
+    for label, knowledge in puzzles:
+        report(label, knowledge)
+
+    print("Seconds to check each symbol one at a time / all at once")
+    print("Knights and knaves")
+    for n in [2, 3, 4, 5, 6, 10, 12, 20, 40]:
+        knowledge, symbols = puzzle.generate(n, seed=rng.randrange(2 ** 32))
+        compare("knights and knaves", n, knowledge, symbols, rows)
+
+    print("Random 3-SAT (4.26 clauses per symbol)")
+    for n in [6, 10, 12, 20, 24, 40, 100]:
+        knowledge, symbols = random_3sat(n, round(4.26 * n), rng)
+        compare("random 3-sat", n, knowledge, symbols, rows)
+
+    print("Adding the sentences of a 40-person puzzle one at a time, "
+          "checking every symbol after each")
+    knowledge, symbols = puzzle.generate(40, seed=rng.randrange(2 ** 32))
+    incremental(knowledge.conjuncts, symbols)
+
+    print("Model counting")
+    for n in [20, 100, 200, 400]:
+        knowledge, symbols = puzzle.generate(n, seed=rng.randrange(2 ** 32))
+        start = time.perf_counter()
+        count = count_models(knowledge)
+        print(f"  {n:>5} people: {count} models "
+              f"in {time.perf_counter() - start:8.4f} s")
+
+    print("Parallel enumeration of 16 symbols, by workers")
+    knowledge, symbols = random_3sat(16, 48, rng)
+    scaling(knowledge, Or(symbols[0], Not(symbols[0])), [1, 2, 4, 8])
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=[
+                "family", "size", "symbols", "backend", "mode", "seconds"
+            ])
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def random_3sat(n, m, rng):
+    """
+    Returns a knowledge base of `m` random clauses of three literals
+    over `n` symbols, and the list of its symbols.
+    """
+    symbols = [Symbol(f"x{i}") for i in range(n)]
+    knowledge = And()
+    for _ in range(m):
+        knowledge.add(Or(*[
+            symbol if rng.random() < 0.5 else Not(symbol)
+            for symbol in rng.sample(symbols, 3)
+        ]))
+    return knowledge, symbols
+
+
+def report(label, knowledge):
+    """
+    Prints the node count of a knowledge base before and after simplify,
+    and how many clauses cnf and tseitin turn the result into.
+    """
+    simplified = simplify(knowledge)
+    print(f"  {label:>12}: {count_nodes(knowledge):6} -> "
+          f"{count_nodes(simplified):6} nodes, "
+          f"{len(cnf(simplified))} / {len(tseitin(simplified))} clauses")
+
+
+def incremental(sentences, symbols):
+    """
+    Prints how long it takes to check every symbol after each sentence is
+    added, with a KnowledgeBase kept throughout and with sat_entailments
+    starting over each time, and fails if the two disagree.
+    """
+    start = time.perf_counter()
+    knowledge = KnowledgeBase()
+    kept = []
+    for sentence in sentences:
+        knowledge.add(sentence)
+        kept.append(knowledge.entailments(symbols))
+    print(f"  {'kept':>12}: {time.perf_counter() - start:8.4f} s")
+
+    start = time.perf_counter()
+    rebuilt = []
+    for i in range(len(sentences)):
+        rebuilt.append(sat_entailments(And(*sentences[:i + 1]), symbols))
+    print(f"  {'rebuilt':>12}: {time.perf_counter() - start:8.4f} s")
+    if kept != rebuilt:
+        sys.exit("Incremental and rebuilt knowledge bases disagree.")
+
+
+def scaling(knowledge, query, workers):
+    """
+    Prints how long parallel_check takes with each number of workers,
+    for an entailed query, so that every model has to be checked.
+    """
+    start = time.perf_counter()
+    model_check(knowledge, query)
+    print(f"  {'model_check':>12}: {time.perf_counter() - start:8.4f} s")
+    for n in workers:
+        start = time.perf_counter()
+        if not parallel_check(knowledge, query, workers=n):
+            sys.exit("Query should be entailed.")
+        print(f"  {n:>4} workers: {time.perf_counter() - start:8.4f} s")
+
+
+def compare(family, size, knowledge, symbols, rows):
+    """
+    Prints how long each backend takes to check every symbol against the
+    knowledge base, one at a time and then all at once with entailments,
+    adding a row for each timing to `rows`, and fails if any two
+    backends disagree.
+    """
+    results = dict()
+    timings = []
+    for backend in BACKENDS:
+        if len(symbols) > LIMITS.get(backend, len(symbols)):
+            continue
+        modes = ["single"] + (["batch"] if backend in BATCH_BACKENDS else [])
+        seconds = []
+        for mode in modes:
+            start = time.perf_counter()
+            if mode == "single":
+                results[backend] = [
+                    model_check(knowledge, symbol, backend=backend)
+                    for symbol in symbols
+                ]
+            else:
+                results[f"{backend} batch"] = entailments(
+                    knowledge, symbols, backend=backend
+                )
+            seconds.append(time.perf_counter() - start)
+            rows.append({"family": family, "size": size,
+                         "symbols": len(symbols), "backend": backend,
+                         "mode": mode, "seconds": seconds[-1]})
+        timings.append(f"{backend} "
+                       + " / ".join(f"{s:8.4f} s" for s in seconds))
+    print(f"  {size:>12}: " + "  ".join(timings))
+    if len(set(map(tuple, results.values()))) > 1:
+        sys.exit(f"Backends disagree on {family} of size {size}.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+import argparse
+import csv
+import sys
+import time
+from array import array
+
+import numpy as np
+
+from linkgraph import LinkGraph
+from pagerank import DAMPING, SOLVERS, power_iteration
+
+# Tolerance of the ranks each solver's result is compared against
+EXACT = 1e-12
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Time the iterate_pagerank solvers of pagerank.py"
+    )
+    parser.add_argument("seed", nargs="?", type=int, default=0)
+    parser.add_argument("--tolerance", type=float, default=1e-6,
+                        help="total change in ranks at which solvers stop")
+    parser.add_argument("--csv", metavar="FILE",
+                        help="also write every solver's residual history "
+                             "to FILE")
+    args = parser.parse_args()
+    rng = np.random.default_rng(args.seed)
+    rows = []
+
+    print("Seconds, iterations and error (L1 norm) of each solver")
+    for n in [10000, 100000, 1000000]:
+        print(f"Random links, {n} pages")
+        compare("random", random_graph(n, 10, rng), args.tolerance, rows)
+        print(f"Sites, {n} pages")
+        compare("sites", site_graph(n, 10, rng), args.tolerance, rows)
+
+    if args.csv:
+        with open(args.csv, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=[
+                "family", "pages", "links", "solver", "iteration", "residual"
+            ])
+            writer.writeheader()
+            writer.writerows(rows)
+
+
+def random_graph(n, degree, rng):
+    """
+    Returns a LinkGraph of `n` pages, each linking to `degree` pages
+    chosen at random on average.
+    """
+    sources = rng.integers(n, size=n * degree)
+    targets = rng.integers(n, size=n * degree)
+    return from_links(n, sources, targets)
+
+
+def site_graph(n, degree, rng):
+    """
+    Returns a LinkGraph of `n` pages grouped into sites of about a hundred
+    pages, more like the web than random_graph: a tenth of the pages have
+    no links, most links stay within their site, and the rest lead to
+    pages that are more likely the lower their number. Some sites link
+    only among themselves.
+    """
+    sites = np.sort(rng.integers(n // 100 + 1, size=n))
+    first = np.searchsorted(sites, sites)
+    size = np.searchsorted(sites, sites, side="right") - first
+    counts = rng.poisson(degree, size=n) * (rng.random(n) >= 0.1)
+    sources = np.repeat(np.arange(n), counts)
+    targets = first[sources] + rng.integers(size[sources])
+    closed = sites[sources] % 50 == 0
+    outside = (rng.random(len(sources)) < 0.2) & ~closed
+    targets[outside] = np.minimum(
+        rng.zipf(1.5, size=outside.sum()) - 1, n - 1
+    )
+    return from_links(n, sources, targets)
+
+
+def from_links(n, sources, targets):
+    """
+    Returns the LinkGraph of `n` pages with a link from each of `sources`
+    to the matching page of `targets`, leaving out repeated links and
+    links from a page to itself.
+    """
+    links = np.unique(sources.astype(np.int64) * n + targets)
+    sources, targets = links // n, links % n
+    keep = sources != targets
+    sources, targets = sources[keep], targets[keep]
+    offsets = np.searchsorted(sources, np.arange(n + 1)).astype(np.intc)
+    return LinkGraph([f"{p:07}.html" for p in range(n)],
+                     array("i", offsets.tobytes()),
+                     array("i", targets.astype(np.intc).tobytes()))
+
+
+def compare(family, graph, tolerance, rows):
+    """
+    Prints how long each solver takes to rank the pages of a LinkGraph,
+    how many iterations it needs and how far its ranks are from the exact
+    ones, adding a row to `rows` for each iteration of each solver, and
+    fails if any solver is off by more than the tolerance allows.
+    """
+    exact, _ = power_iteration(graph, DAMPING, EXACT)
+    for name, solver in SOLVERS.items():
+        start = time.perf_counter()
+        ranks, residuals = solver(graph, DAMPING, tolerance)
+        seconds = time.perf_counter() - start
+        error = np.abs(ranks - exact).sum()
+        print(f"  {name:>12}: {seconds:8.4f} s {len(residuals):5} "
+              f"iterations, error {error:.1e}")
+        rows.extend({"family": family, "pages": len(graph),
+                     "links": len(graph.links), "solver": name,
+                     "iteration": i, "residual": residual}
+                    for i, residual in enumerate(residuals, 1))
+        if error > 100 * tolerance:
+            sys.exit(f"{name} is off on {family} of {len(graph)} pages.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,66 +1,90 @@
-import csv
+import argparse
+import collections
+import heapq
+import json
+import multiprocessing
+import random
 import sys
+import time
 
-from util import Node, StackFrontier, QueueFrontier
+from graph import (UNREACHABLE, build_landmarks, load_graph, load_landmarks,
+                   write_landmarks)
+from util import (Node, StackFrontier, QueueFrontier,
+                  InstrumentedQueueFrontier, SearchStats)
 
-# Maps names to a set of corresponding person_ids
-names = {}
+# People, movies and who starred in what, as a compact integer-indexed graph
+graph = None
 
-# Maps person_ids to a dictionary of: name, birth, movies (a set of movie_ids)
-people = {}
-
-# Maps movie_ids to a dictionary of: title, year, stars (a set of person_ids)
-movies = {}
+# Distances from a few landmark people to everyone, if built for this data
+landmarks = None
 
 
 def load_data(directory):
     """
-    Load data from CSV files into memory.
-    """
-    # Load people
-    with open(f"{directory}/people.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            people[row["id"]] = {
-                "name": row["name"],
-                "birth": row["birth"],
-                "movies": set()
-            }
-            if row["name"].lower() not in names:
-                names[row["name"].lower()] = {row["id"]}
-            else:
-                names[row["name"].lower()].add(row["id"])
-
-    # Load movies
-    with open(f"{directory}/movies.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            movies[row["id"]] = {
-                "title": row["title"],
-                "year": row["year"],
-                "stars": set()
-            }
-
-    # Load stars
-    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
-        reader = csv.DictReader(f)
-        for row in reader:
-            try:
-                people[row["person_id"]]["movies"].add(row["movie_id"])
-                movies[row["movie_id"]]["stars"].add(row["person_id"])
-            except KeyError:
-                pass
+    Load data from CSV files (or their up-to-date snapshot) into memory.
+    """
+    global graph, landmarks
+    graph = load_graph(directory)
+    landmarks = load_landmarks(directory, graph)
 
 
 def main():
-    if len(sys.argv) > 2:
-        sys.exit("Usage: python degrees.py [directory]")
-    directory = sys.argv[1] if len(sys.argv) == 2 else "large"
+    parser = argparse.ArgumentParser()
+    parser.add_argument("directory", nargs="?", default="large")
+    parser.add_argument("--bidirectional", action="store_true",
+                        help="search from both people at once")
+    parser.add_argument("--landmarks", action="store_true",
+                        help="A* search bounded by the landmark index")
+    parser.add_argument("--build-landmarks", type=int, metavar="K",
+                        help="build an index of K landmarks and exit")
+    parser.add_argument("--batch", metavar="FILE",
+                        help="answer tab-separated name pairs from FILE "
+                             "(- for stdin) as JSON lines")
+    parser.add_argument("--distribution", type=int, metavar="N",
+                        help="write the distance histograms from N random "
+                             "people as JSON lines (0 for everyone)")
+    parser.add_argument("--output", metavar="FILE", default="-",
+                        help="where --distribution writes (- for stdout)")
+    parser.add_argument("--stats", action="store_true",
+                        help="report search statistics as JSON")
+    parser.add_argument("--trace-memory", action="store_true",
+                        help="include peak memory in search statistics")
+    parser.add_argument("--workers", type=int, default=1,
+                        help="processes answering batch queries "
+                             "or computing distributions")
+    args = parser.parse_args()
+    search = (bidirectional_shortest_path if args.bidirectional
+              else landmark_shortest_path if args.landmarks
+              else shortest_path)
+
+    if args.build_landmarks is not None:
+        print("Loading data...")
+        load_data(args.directory)
+        print(f"Building {args.build_landmarks} landmarks...")
+        write_landmarks(build_landmarks(graph, args.build_landmarks),
+                        args.directory)
+        print("Landmarks built.")
+        return
+
+    stats = args.stats or args.trace_memory
+
+    if args.batch is not None:
+        batch(args.directory, args.batch, search, args.workers,
+              stats, args.trace_memory)
+        return
+
+    if args.distribution is not None:
+        distribution(args.directory, args.distribution, args.output,
+                     args.workers)
+        return
+    directory = args.directory
 
     # Load data from files into memory
     print("Loading data...")
     load_data(directory)
     print("Data loaded.")
+    if args.landmarks and landmarks is None:
+        sys.exit("No landmark index; build one with --build-landmarks.")
 
     source = person_id_for_name(input("Name: "))
     if source is None:
@@ -69,7 +93,12 @@ def main():
     if target is None:
         sys.exit("Person not found.")
 
-    path = shortest_path(source, target)
+    if stats:
+        search_stats = SearchStats(args.trace_memory)
+        path = search(source, target, search_stats)
+        print(search_stats.to_json(), file=sys.stderr)
+    else:
+        path = search(source, target)
 
     if path is None:
         print("Not connected.")
@@ -78,80 +107,458 @@ def main():
         print(f"{degrees} degrees of separation.")
         path = [(None, source)] + path
         for i in range(degrees):
-            person1 = people[path[i][1]]["name"]
-            person2 = people[path[i + 1][1]]["name"]
-            movie = movies[path[i + 1][0]]["title"]
+            person1 = graph.person_names[graph.person(path[i][1])]
+            person2 = graph.person_names[graph.person(path[i + 1][1])]
+            movie = graph.movie_titles[graph.movie(path[i + 1][0])]
             print(f"{i + 1}: {person1} and {person2} starred in {movie}")
 
 
-def shortest_path(source, target):
+def batch(directory, filename, search, workers, stats=False,
+          trace_memory=False):
+    """
+    Answers every line "name<TAB>name" of `filename` (or stdin, for "-"),
+    writing one JSON object per query to stdout in input order,
+    including search statistics if `stats` is true.
+
+    The graph is loaded once. Worker processes started by fork share it
+    read-only; others open the same memory-mapped snapshot.
+    """
+    print("Loading data...", file=sys.stderr)
+    load_data(directory)
+    print("Data loaded.", file=sys.stderr)
+    if search is landmark_shortest_path and landmarks is None:
+        sys.exit("No landmark index; build one with --build-landmarks.")
+
+    f = sys.stdin if filename == "-" else open(filename, encoding="utf-8")
+    queries = ((line, search, stats, trace_memory)
+               for line in f if line.strip())
+    start = time.perf_counter()
+    count = 0
+    try:
+        if workers > 1:
+            with multiprocessing.Pool(workers, initializer=start_worker,
+                                      initargs=(directory,)) as pool:
+                for result in pool.imap(answer, queries, chunksize=16):
+                    print(result)
+                    count += 1
+        else:
+            for query in queries:
+                print(answer(query))
+                count += 1
+    finally:
+        if f is not sys.stdin:
+            f.close()
+    elapsed = time.perf_counter() - start
+    print(f"Answered {count} queries in {elapsed:.2f} s "
+          f"({count / elapsed if elapsed else 0:.1f} queries/s).",
+          file=sys.stderr)
+
+
+def start_worker(directory):
+    """Loads the graph in a batch worker, unless it came with the fork."""
+    if graph is None:
+        load_data(directory)
+
+
+def answer(query):
+    """
+    Answers one batch query, a (line, search, stats, trace_memory) tuple.
+    Returns the answer as a line of JSON.
+    """
+    line, search, stats, trace_memory = query
+    pair = line.rstrip("\n").split("\t")
+    if len(pair) != 2:
+        return json.dumps({"query": line.rstrip("\n"),
+                           "error": "expected two tab-separated names"})
+    result = {"source": pair[0], "target": pair[1]}
+
+    person_ids = []
+    for name in pair:
+        matches = graph.people_named(name)
+        if len(matches) != 1:
+            result["error"] = (f"person not found: {name}" if not matches
+                               else f"ambiguous name: {name}")
+            result["candidates"] = find_people(name)
+            return json.dumps(result)
+        person_ids.append(graph.person_ids[matches[0]])
+
+    search_stats = SearchStats(trace_memory) if stats else None
+    try:
+        path = search(*person_ids, stats=search_stats)
+    except Exception as e:
+        result["error"] = str(e)
+        return json.dumps(result)
+    result["degrees"] = None if path is None else len(path)
+    result["path"] = path
+    if search_stats is not None:
+        result["stats"] = search_stats.as_dict()
+    return json.dumps(result)
+
+
+def distribution(directory, n, filename, workers):
+    """
+    Computes the distribution of degrees of separation from `n` random
+    people (or everyone, for 0) to everyone else.
+
+    Writes one JSON object per source to `filename` (or stdout, for "-")
+    as soon as it is computed, followed by a summary over all sources.
+    Only the combined histogram is kept in memory.
+    """
+    print("Loading data...", file=sys.stderr)
+    load_data(directory)
+    print("Data loaded.", file=sys.stderr)
+
+    people = range(len(graph.person_ids))
+    sources = people if n == 0 else random.sample(people, min(n, len(people)))
+    total = collections.Counter()
+    count = 0
+
+    f = sys.stdout if filename == "-" else open(filename, "w",
+                                                encoding="utf-8")
+    start = time.perf_counter()
+    try:
+        if workers > 1:
+            with multiprocessing.Pool(workers, initializer=start_worker,
+                                      initargs=(directory,)) as pool:
+                results = pool.imap_unordered(source_distribution, sources,
+                                              chunksize=4)
+                for result in results:
+                    total.update(dict(enumerate(result["histogram"])))
+                    print(json.dumps(result), file=f, flush=True)
+                    count += 1
+        else:
+            for source in sources:
+                result = source_distribution(source)
+                total.update(dict(enumerate(result["histogram"])))
+                print(json.dumps(result), file=f, flush=True)
+                count += 1
+
+        print(json.dumps(summarize(total, count)), file=f)
+    finally:
+        if f is not sys.stdout:
+            f.close()
+    elapsed = time.perf_counter() - start
+    print(f"Computed {count} distributions in {elapsed:.2f} s.",
+          file=sys.stderr)
+
+
+def distances_from(person_id):
+    """
+    Returns the degrees of separation from a person to everyone,
+    as a bytearray indexed like `graph.person_ids`, holding
+    UNREACHABLE for people who are not connected to them.
+    """
+    return graph.distances_from(graph.person(person_id))
+
+
+def source_distribution(person):
+    """
+    Returns the distance statistics from one person, by graph index:
+    how many people are at each distance, and the summary over them.
+    """
+    counts = collections.Counter(graph.distances_from(person))
+    counts.pop(UNREACHABLE, None)
+    result = {"id": graph.person_ids[person],
+              "name": graph.person_names[person]}
+    result.update(summarize(counts, 1))
+    return result
+
+
+def summarize(counts, sources):
+    """
+    Summarizes a Counter of distances gathered from `sources` people:
+    how many people were reached, their mean distance, the largest
+    distance, and the histogram of distances.
+    """
+    reachable = sum(counts.values())
+    largest = max(counts, default=0)
+    return {
+        "sources": sources,
+        "reachable": reachable,
+        "mean": (sum(distance * count for distance, count in counts.items())
+                 / reachable if reachable else 0),
+        "largest": largest,
+        "histogram": [counts[distance] for distance in range(largest + 1)]
+    }
+
+
+def shortest_path(source, target, stats=None):
     """
     Returns the shortest list of (movie_id, person_id) pairs
     that connect the source to the target.
 
     If no possible path, returns None.
+    Given a SearchStats, fills it in as the search goes.
     """
+    if stats is not None:
+        stats.start()
+    source = graph.person(source)
+    target = graph.person(target)
+    if stats is not None:
+        stats.mark("resolve")
+    if source == target:
+        return path_ids([], stats)
   
     #Initialize frontier to starting position
     start = Node(state = source, parent = None, action = None)
-    frontier = QueueFrontier()
+    frontier = (QueueFrontier() if stats is None
+                else InstrumentedQueueFrontier(stats))
     frontier.add(start)
     
-    #Initialize set of explored nodes
-    explored = set()
+    #Initialize sets of people reached and movies whose cast has been reached
+    reached = {source}
+    movies_seen = set()
     
     #Loop around to find path
-    while True:
-        
-        if frontier.empty():
-            raise Exception("no path")
-            
+    while not frontier.empty():
         
         #Choose node from frontier
         node = frontier.remove()
         
-        #What to do when node is goal
-        if node.state == target:
-            solution = []
-            
-            #Building the output list
-            while node.parent is not None:
-                solution.append((node.action, node.state))
-                node = node.parent
-            
-            solution.reverse()
-            return solution
-        
-        #Add node to explored
-        explored.add(node.state)
-        
-        #Expand the node
-        next_up = neighbors_for_person(node.state)
-        for item in next_up:
+        #Expand the node, testing each child for the goal as it is generated
+        for movie, person in graph.unseen_neighbors(
+            node.state, reached, movies_seen
+        ):
+            child = Node(state = person, parent = node, action = movie)
             
-            #Check to see if person_id is in frontier and already explored
-            if not frontier.contains_state(list(item)[1]) and list(item)[1] not in explored:
-                #Extracting second element from a 2-tuple
+            #What to do when child is goal
+            if person == target:
+                if stats is not None:
+                    expanded = len(reached) - len(frontier.frontier)
+                    search_finished(stats, expanded, len(reached) + 1)
+                solution = []
                 
-                child = Node(state = list(item)[1], parent = node, action = list(item)[0])
-                frontier.add(child)
-            
+                #Building the output list
+                while child.parent is not None:
+                    solution.append((child.action, child.state))
+                    child = child.parent
+                
+                solution.reverse()
+                return path_ids(solution, stats)
             
+            reached.add(person)
+            frontier.add(child)
+    
+    if stats is not None:
+        search_finished(stats, len(reached), len(reached))
+        stats.stop()
+    return None
+
+
+def bidirectional_shortest_path(source, target, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, searching breadth-first
+    from both ends at once and stopping where the two searches meet.
+
+    If no possible path, returns None.
+    Given a SearchStats, fills it in as the search goes.
+    """
+    if stats is not None:
+        stats.start()
+    source = graph.person(source)
+    target = graph.person(target)
+    if stats is not None:
+        stats.mark("resolve")
+    if source == target:
+        return path_ids([], stats)
+
+    # Each side maps a reached person to the (movie, person)
+    # step that leads back towards the side's own starting person
+    forward = {source: None}
+    backward = {target: None}
+    forward_movies = set()
+    backward_movies = set()
+    forward_frontier = [source]
+    backward_frontier = [target]
+    expanded = 0
+
+    while forward_frontier and backward_frontier:
+
+        # Expand a whole level of whichever side has the smaller frontier
+        if len(forward_frontier) <= len(backward_frontier):
+            forward_frontier, meeting, count = expand_level(
+                forward_frontier, forward, forward_movies, backward
+            )
+        else:
+            backward_frontier, meeting, count = expand_level(
+                backward_frontier, backward, backward_movies, forward
+            )
+        expanded += count
+        if stats is not None:
+            stats.frontier_size(len(forward_frontier) + len(backward_frontier))
+
+        # The first meeting is a shortest path: without an earlier meeting,
+        # every path is longer than the two depths searched so far combined
+        if meeting is not None:
+            if stats is not None:
+                search_finished(stats, expanded, len(forward) + len(backward))
+            solution = []
+            person = meeting
+            while forward[person] is not None:
+                movie, parent = forward[person]
+                solution.append((movie, person))
+                person = parent
+            solution.reverse()
+
+            person = meeting
+            while backward[person] is not None:
+                movie, person = backward[person]
+                solution.append((movie, person))
+            return path_ids(solution, stats)
+
+    if stats is not None:
+        search_finished(stats, expanded, len(forward) + len(backward))
+        stats.stop()
+    return None
+
+
+def landmark_shortest_path(source, target, stats=None):
+    """
+    Returns the shortest list of (movie_id, person_id) pairs
+    that connect the source to the target, by A* search using
+    landmark distances as lower bounds on the distance left to go.
+
+    If no possible path, returns None.
+    Given a SearchStats, fills it in as the search goes.
+    """
+    if stats is not None:
+        stats.start()
+    source = graph.person(source)
+    target = graph.person(target)
+    bound = landmarks.heuristic(target)
+    if stats is not None:
+        stats.mark("resolve")
+    if bound(source) is None:
+        if stats is not None:
+            search_finished(stats, 0, 0)
+            stats.stop()
+        return None
+
+    # Maps each reached person to their (movie, person) parent step
+    # and their distance from the source
+    parents = {source: None}
+    distances = {source: 0}
+    explored = set()
+
+    # Frontier entries are (estimated path length, -distance, person),
+    # preferring the deeper person when estimates tie
+    frontier = [(bound(source), 0, source)]
+
+    while frontier:
+        if stats is not None:
+            stats.frontier_size(len(frontier))
+        _, depth, person = heapq.heappop(frontier)
+        distance = -depth
+        if person == target:
+            if stats is not None:
+                search_finished(stats, len(explored), len(parents))
+            solution = []
+            while parents[person] is not None:
+                movie, parent = parents[person]
+                solution.append((movie, person))
+                person = parent
+            solution.reverse()
+            return path_ids(solution, stats)
+        if person in explored:
+            continue
+        explored.add(person)
+
+        # Landmark bounds are consistent, so people are explored
+        # in order of their true distance and never need reopening
+        for movie, neighbor in graph.neighbors(person):
+            if neighbor in distances and distances[neighbor] <= distance + 1:
+                continue
+            estimate = bound(neighbor)
+            if estimate is None:
+                continue
+            parents[neighbor] = (movie, person)
+            distances[neighbor] = distance + 1
+            heapq.heappush(
+                frontier, (distance + 1 + estimate, -(distance + 1), neighbor)
+            )
+
+    if stats is not None:
+        search_finished(stats, len(explored), len(parents))
+        stats.stop()
+    return None
+
+
+def expand_level(frontier, parents, movies_seen, other_parents):
+    """
+    Expands every person in one level of a bidirectional search.
+
+    Returns the next level, the first person reached by both searches
+    (or None if the searches have not met yet), and how many people
+    were expanded.
+    """
+    next_frontier = []
+    for expanded, person in enumerate(frontier, 1):
+        for movie, neighbor in graph.unseen_neighbors(
+            person, parents, movies_seen
+        ):
+            parents[neighbor] = (movie, person)
+            if neighbor in other_parents:
+                return next_frontier, neighbor, expanded
+            next_frontier.append(neighbor)
+    return next_frontier, None, len(frontier)
+
+
+def search_finished(stats, expanded, explored):
+    """Records a finished search's counts, and ends its search phase."""
+    stats.expanded = expanded
+    stats.explored = explored
+    stats.mark("search")
+
+
+def path_ids(path, stats=None):
+    """
+    Converts a path of (movie, person) graph indices
+    into (movie_id, person_id) IMDb id pairs.
+
+    Given a SearchStats, this ends the search: the time since its
+    search phase is recorded as building the path.
+    """
+    path = [(graph.movie_ids[movie], graph.person_ids[person])
+            for movie, person in path]
+    if stats is not None:
+        stats.mark("path")
+        stats.stop()
+    return path
+
+
+def find_people(name, n=10):
+    """
+    Returns up to `n` people matching a name exactly, by prefix or with
+    one typo, without asking the user to choose between them.
+
+    Each is a dictionary of: id, name, birth and movies (how many
+    movies they starred in). Exact matches come first, and otherwise
+    people with more movies come first.
+    """
+    return [{
+        "id": graph.person_ids[person],
+        "name": graph.person_names[person],
+        "birth": graph.person_births[person],
+        "movies": graph.film_count(person)
+    } for person in graph.search_names(name, n)]
+
 
 def person_id_for_name(name):
     """
     Returns the IMDB id for a person's name,
     resolving ambiguities as needed.
     """
-    person_ids = list(names.get(name.lower(), set()))
+    person_ids = [graph.person_ids[person]
+                  for person in graph.people_named(name)]
     if len(person_ids) == 0:
         return None
     elif len(person_ids) > 1:
         print(f"Which '{name}'?")
         for person_id in person_ids:
-            person = people[person_id]
-            name = person["name"]
-            birth = person["birth"]
+            person = graph.person(person_id)
+            name = graph.person_names[person]
+            birth = graph.person_births[person]
             print(f"ID: {person_id}, Name: {name}, Birth: {birth}")
         try:
             person_id = input("Intended Person ID: ")
@@ -169,11 +576,9 @@ def neighbors_for_person(person_id):
     Returns (movie_id, person_id) pairs for people
     who starred with a given person.
     """
-    movie_ids = people[person_id]["movies"]
     neighbors = set()
-    for movie_id in movie_ids:
-        for person_id in movies[movie_id]["stars"]:
-            neighbors.add((movie_id, person_id))
+    for movie, person in graph.neighbors(graph.person(person_id)):
+        neighbors.add((graph.movie_ids[movie], graph.person_ids[person]))
     return neighbors
 
 
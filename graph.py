@@ -0,0 +1,680 @@
+import bisect
+import csv
+import mmap
+import os
+import heapq
+import struct
+import zlib
+from array import array
+
+# Name of the binary snapshot written next to the CSV files
+SNAPSHOT = "graph.snapshot"
+
+# Name of the landmark distance index written next to the CSV files
+LANDMARKS = "landmarks.index"
+
+# Distance stored for people a landmark cannot reach; real distances
+# are capped one below it, which keeps landmark bounds admissible
+UNREACHABLE = 255
+
+# Snapshot header: magic, format version, a byte-order check, the size and
+# modification time of each CSV file, then how many sections follow
+HEADER = struct.Struct("=8sII6qI")
+MAGIC = b"DEGREES\0"
+VERSION = 3
+
+# Item size in bytes of each snapshot section: the offsets and UTF-8 data
+# of six string tables, then seven arrays of 4-byte integers
+SECTION_ITEMS = (4, 1) * 6 + (4,) * 7
+
+# Landmark index header: as for snapshots, then the number of landmarks
+# and of people
+LANDMARK_HEADER = struct.Struct("=8sII6qII")
+LANDMARK_MAGIC = b"LANDMARK"
+LANDMARK_VERSION = 1
+
+# Characters tried when looking for names one typo away from a query
+NAME_ALPHABET = "abcdefghijklmnopqrstuvwxyz .-'"
+BYTE_ORDER = 0x01020304
+SOURCES = ("people.csv", "movies.csv", "stars.csv")
+
+
+class StringTable():
+    """
+    Read-only sequence of strings packed into a single UTF-8 buffer,
+    with `offsets[i]:offsets[i + 1]` spanning the i-th string.
+    """
+
+    def __init__(self, offsets, data):
+        self.offsets = offsets
+        self.data = data
+
+    @classmethod
+    def from_strings(cls, strings):
+        offsets = array("i", [0])
+        data = bytearray()
+        for s in strings:
+            data += s.encode("utf-8")
+            offsets.append(len(data))
+        return cls(offsets, bytes(data))
+
+    def __len__(self):
+        return len(self.offsets) - 1
+
+    def __getitem__(self, i):
+        if not 0 <= i < len(self):
+            raise IndexError("string table index out of range")
+        return str(self.data[self.offsets[i]:self.offsets[i + 1]], "utf-8")
+
+    def index(self, s):
+        """Returns the position of `s`, which requires the table be sorted."""
+        i = bisect.bisect_left(self, s)
+        if i == len(self) or self[i] != s:
+            raise KeyError(s)
+        return i
+
+
+class SortedNames():
+    """
+    Lowercased person names, in alphabetical order, as a read-only sequence
+    suitable for bisect. `order[k]` is the person with the k-th name.
+    """
+
+    def __init__(self, names, order):
+        self.names = names
+        self.order = order
+
+    def __len__(self):
+        return len(self.order)
+
+    def __getitem__(self, k):
+        return self.names[self.order[k]].lower()
+
+
+class Graph():
+    """
+    People and movies interned to dense integers, in sorted order of
+    their IMDb ids, with the star relation stored both ways round as
+    compressed sparse rows: the movies of person `p` are
+    `person_movies[person_offsets[p]:person_offsets[p + 1]]`, and the
+    stars of movie `m` are `movie_stars[movie_offsets[m]:movie_offsets[m + 1]]`.
+    People are also listed in order of their lowercased names in `name_order`,
+    and `name_table` is an open-addressing hash table mapping each distinct
+    lowercased name to its first position in that order, with the CRC-32
+    of the name in the matching slot of `name_hashes`.
+    """
+
+    def __init__(self, person_ids, person_names, person_births,
+                 movie_ids, movie_titles, movie_years,
+                 person_offsets, person_movies, movie_offsets, movie_stars,
+                 name_order, name_table, name_hashes):
+        self.person_ids = person_ids
+        self.person_names = person_names
+        self.person_births = person_births
+        self.movie_ids = movie_ids
+        self.movie_titles = movie_titles
+        self.movie_years = movie_years
+        self.person_offsets = person_offsets
+        self.person_movies = person_movies
+        self.movie_offsets = movie_offsets
+        self.movie_stars = movie_stars
+        self.name_order = name_order
+        self.sorted_names = SortedNames(person_names, name_order)
+        self.name_table = name_table
+        self.name_hashes = name_hashes
+
+    def person(self, person_id):
+        """Returns the integer index of an IMDb person id."""
+        return self.person_ids.index(person_id)
+
+    def movie(self, movie_id):
+        """Returns the integer index of an IMDb movie id."""
+        return self.movie_ids.index(movie_id)
+
+    def people_named(self, name):
+        """Returns the indices of people whose name matches, ignoring case."""
+        return [self.name_order[k]
+                for k in range(*self.name_range(name.lower()))]
+
+    def distances_from(self, person):
+        """
+        Returns the breadth-first distance from a person to every person,
+        as a bytearray indexed by person holding UNREACHABLE for people
+        in other components.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+        distances = bytearray([UNREACHABLE]) * len(self.person_ids)
+        distances[person] = 0
+
+        # Every movie's cast only needs scanning the first time it is reached
+        movies_seen = bytearray(len(self.movie_ids))
+        frontier = [person]
+        depth = 0
+        while frontier:
+            depth = min(depth + 1, UNREACHABLE - 1)
+            next_frontier = []
+            for person in frontier:
+                for i in range(person_offsets[person],
+                               person_offsets[person + 1]):
+                    movie = person_movies[i]
+                    if movies_seen[movie]:
+                        continue
+                    movies_seen[movie] = 1
+                    for j in range(movie_offsets[movie],
+                                   movie_offsets[movie + 1]):
+                        star = movie_stars[j]
+                        if distances[star] == UNREACHABLE:
+                            distances[star] = depth
+                            next_frontier.append(star)
+            frontier = next_frontier
+        return distances
+
+    def film_count(self, person):
+        """Returns how many movies a person starred in."""
+        return self.person_offsets[person + 1] - self.person_offsets[person]
+
+    def search_names(self, query, n=10):
+        """
+        Returns up to `n` people whose lowercased name equals `query`,
+        starts with it, or is one typo (a deleted, inserted, replaced or
+        transposed character) away from it.
+
+        Exact matches come first, then the rest, each ranked by film count.
+        """
+        query = query.lower()
+        sorted_names = self.sorted_names
+        exact = sorted(self.people_named(query), key=self.film_count,
+                       reverse=True)
+        if len(exact) >= n:
+            return exact[:n]
+
+        # Every name starting with the query is a neighbour in sorted order
+        positions = set(range(
+            bisect.bisect_right(sorted_names, query),
+            bisect.bisect_left(sorted_names, query + "\U0010ffff")
+        ))
+
+        # Names one typo away are looked up in the hash table
+        for variant, k in self.name_positions(typos(query)):
+            positions.update(range(*self.name_range(variant, k)))
+
+        # Exact matches are left out, or they would take places in the top
+        exact_set = set(exact)
+        rest = heapq.nlargest(
+            n - len(exact),
+            (person for person in map(self.name_order.__getitem__, positions)
+             if person not in exact_set),
+            key=self.film_count
+        )
+        return exact + rest
+
+    def name_position(self, name):
+        """
+        Returns the first position of a lowercased name in `name_order`,
+        or None if no one has that name.
+        """
+        for _, k in self.name_positions([name]):
+            return k
+        return None
+
+    def name_positions(self, names):
+        """
+        Yields (name, first position in `name_order`) for each of the
+        lowercased `names` that someone has, by probing the hash table.
+        Names are only decoded to confirm a slot whose hash matches.
+        """
+        name_table = self.name_table
+        name_hashes = self.name_hashes
+        sorted_names = self.sorted_names
+        mask = len(name_table) - 1
+        for name in names:
+            crc = zlib.crc32(name.encode("utf-8"))
+            slot = crc & mask
+            while True:
+                k = name_table[slot]
+                if k < 0:
+                    break
+                if name_hashes[slot] == crc and sorted_names[k] == name:
+                    yield name, k
+                    break
+                slot = (slot + 1) & mask
+
+    def name_range(self, name, start=None):
+        """
+        Returns the (start, end) positions in `name_order` of the people
+        with a lowercased name, given its first position if known.
+        """
+        if start is None:
+            start = self.name_position(name)
+            if start is None:
+                return 0, 0
+        end = start + 1
+        while end < len(self.sorted_names) and self.sorted_names[end] == name:
+            end += 1
+        return start, end
+
+    def movies_for(self, person):
+        """Returns the movie indices a person starred in."""
+        return self.person_movies[
+            self.person_offsets[person]:self.person_offsets[person + 1]
+        ]
+
+    def stars_for(self, movie):
+        """Returns the person indices starring in a movie."""
+        return self.movie_stars[
+            self.movie_offsets[movie]:self.movie_offsets[movie + 1]
+        ]
+
+    def neighbors(self, person):
+        """
+        Yields (movie, person) index pairs for people who starred
+        with a given person, including the person themselves.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+        for i in range(person_offsets[person], person_offsets[person + 1]):
+            movie = person_movies[i]
+            for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                yield movie, movie_stars[j]
+
+    def unseen_neighbors(self, person, people_seen, movies_seen):
+        """
+        Yields (movie, person) index pairs for people who starred with a
+        given person and are not in `people_seen`, checked as each one is
+        reached so that people the caller records meanwhile are skipped.
+
+        Movies are added to `movies_seen` and never scanned again: once one
+        cast member has been expanded, the rest of the cast has been reached.
+        """
+        person_offsets = self.person_offsets
+        person_movies = self.person_movies
+        movie_offsets = self.movie_offsets
+        movie_stars = self.movie_stars
+        for i in range(person_offsets[person], person_offsets[person + 1]):
+            movie = person_movies[i]
+            if movie in movies_seen:
+                continue
+            movies_seen.add(movie)
+            for j in range(movie_offsets[movie], movie_offsets[movie + 1]):
+                star = movie_stars[j]
+                if star not in people_seen:
+                    yield movie, star
+
+
+class Landmarks():
+    """
+    Breadth-first distances from a few landmark people to every person:
+    `distances[k * people + p]` is the distance from `landmarks[k]` to `p`.
+    """
+
+    def __init__(self, landmarks, distances, people):
+        self.landmarks = landmarks
+        self.distances = memoryview(distances)
+        self.people = people
+
+    def row(self, k):
+        """Returns the distances from the k-th landmark."""
+        return self.distances[k * self.people:(k + 1) * self.people]
+
+    def heuristic(self, target):
+        """
+        Returns a function giving a lower bound on the distance from a
+        person to `target`, or None if the two cannot be connected.
+
+        By the triangle inequality, the distance between two people is at
+        least the difference of their distances to any landmark.
+        """
+        rows = []
+        for k in range(len(self.landmarks)):
+            row = self.row(k)
+            rows.append((row, row[target]))
+
+        def bound(person):
+            best = 0
+            for row, to_target in rows:
+                to_person = row[person]
+                if to_person == UNREACHABLE or to_target == UNREACHABLE:
+                    if to_person != to_target:
+                        return None
+                elif abs(to_person - to_target) > best:
+                    best = abs(to_person - to_target)
+            return best
+
+        return bound
+
+
+def load_graph(directory):
+    """
+    Load people.csv, movies.csv and stars.csv from `directory` into a Graph.
+
+    The graph is read straight from the directory's snapshot when that is
+    up to date with the CSV files. Otherwise the CSV files are parsed,
+    and the snapshot is (re)written for next time.
+    """
+    sources = fingerprint(directory)
+    filename = os.path.join(directory, SNAPSHOT)
+    graph = read_snapshot(filename, sources)
+    if graph is None:
+        graph = parse_graph(directory)
+        try:
+            write_snapshot(graph, filename, sources)
+        except OSError:
+            pass
+    return graph
+
+
+def parse_graph(directory):
+    """
+    Parse people.csv, movies.csv and stars.csv from `directory` into a Graph.
+    """
+    person_ids, person_columns = read_table(
+        f"{directory}/people.csv", ("name", "birth")
+    )
+    movie_ids, movie_columns = read_table(
+        f"{directory}/movies.csv", ("title", "year")
+    )
+
+    # Look ids up through temporary dicts while reading stars,
+    # skipping rows for unknown people or movies
+    person_index = {person_id: i for i, person_id in enumerate(person_ids)}
+    movie_index = {movie_id: i for i, movie_id in enumerate(movie_ids)}
+    movie_count = len(movie_ids)
+    edges = []
+    with open(f"{directory}/stars.csv", encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            try:
+                person = person_index[row["person_id"]]
+                movie = movie_index[row["movie_id"]]
+            except KeyError:
+                continue
+            edges.append(person * movie_count + movie)
+    del person_index, movie_index
+
+    # Sorting edges by (person, movie) gives the person rows directly,
+    # and drops duplicate rows in the same pass
+    edges.sort()
+    person_offsets = array("i", [0]) * (len(person_ids) + 1)
+    person_movies = array("i")
+    movie_counts = array("i", [0]) * movie_count
+    previous = None
+    for edge in edges:
+        if edge == previous:
+            continue
+        previous = edge
+        person, movie = divmod(edge, movie_count)
+        person_offsets[person + 1] += 1
+        person_movies.append(movie)
+        movie_counts[movie] += 1
+    del edges
+    for person in range(len(person_ids)):
+        person_offsets[person + 1] += person_offsets[person]
+
+    # Counting sort the same edges by movie to build the movie rows
+    movie_offsets = array("i", [0])
+    for count in movie_counts:
+        movie_offsets.append(movie_offsets[-1] + count)
+    movie_stars = array("i", [0]) * len(person_movies)
+    fill = array("i", movie_offsets[:-1])
+    for person in range(len(person_ids)):
+        for i in range(person_offsets[person], person_offsets[person + 1]):
+            movie = person_movies[i]
+            movie_stars[fill[movie]] = person
+            fill[movie] += 1
+
+    person_names = person_columns[0]
+    name_order = array("i", sorted(
+        range(len(person_ids)), key=lambda person: person_names[person].lower()
+    ))
+
+    return Graph(
+        StringTable.from_strings(person_ids),
+        StringTable.from_strings(person_names),
+        StringTable.from_strings(person_columns[1]),
+        StringTable.from_strings(movie_ids),
+        StringTable.from_strings(movie_columns[0]),
+        StringTable.from_strings(movie_columns[1]),
+        person_offsets, person_movies, movie_offsets, movie_stars,
+        name_order, *build_name_table(person_names, name_order)
+    )
+
+
+def build_name_table(names, name_order):
+    """
+    Builds the open-addressing hash table from each distinct lowercased
+    name to its first position in `name_order`, using CRC-32 (which,
+    unlike hash(), is the same in every process) and linear probing.
+    The table is at most half full, so probes stay short.
+
+    Returns the table of positions and the table of hashes.
+    """
+    size = 1
+    while size < 2 * len(name_order):
+        size *= 2
+    table = array("i", [-1]) * size
+    hashes = array("I", [0]) * size
+    mask = size - 1
+    previous = None
+    for k, person in enumerate(name_order):
+        name = names[person].lower()
+        if name == previous:
+            continue
+        previous = name
+        crc = zlib.crc32(name.encode("utf-8"))
+        slot = crc & mask
+        while table[slot] >= 0:
+            slot = (slot + 1) & mask
+        table[slot] = k
+        hashes[slot] = crc
+    return table, hashes
+
+
+def typos(word):
+    """
+    Yields the strings one deleted, transposed, replaced or inserted
+    character away from `word`.
+    """
+    for i in range(len(word)):
+        yield word[:i] + word[i + 1:]
+        if i + 1 < len(word) and word[i] != word[i + 1]:
+            yield word[:i] + word[i + 1] + word[i] + word[i + 2:]
+        for c in NAME_ALPHABET:
+            if c != word[i]:
+                yield word[:i] + c + word[i + 1:]
+    for i in range(len(word) + 1):
+        for c in NAME_ALPHABET:
+            yield word[:i] + c + word[i:]
+
+
+def read_table(filename, columns):
+    """
+    Reads a CSV file keyed by an "id" column.
+    Returns the ids in sorted order, and a list of values for each of
+    `columns` in the same order. Repeated ids keep their last row.
+    """
+    rows = dict()
+    with open(filename, encoding="utf-8") as f:
+        reader = csv.DictReader(f)
+        for row in reader:
+            rows[row["id"]] = tuple(row[column] for column in columns)
+    ids = sorted(rows)
+    values = [[rows[i][c] for i in ids] for c in range(len(columns))]
+    return ids, values
+
+
+def fingerprint(directory):
+    """
+    Returns the size and modification time of each CSV file in `directory`,
+    which a snapshot must match to be reused.
+    """
+    sources = []
+    for source in SOURCES:
+        stat = os.stat(os.path.join(directory, source))
+        sources.extend([stat.st_size, stat.st_mtime_ns])
+    return tuple(sources)
+
+
+def graph_sections(graph):
+    """Returns the buffers of a Graph, in snapshot order."""
+    sections = []
+    for table in (graph.person_ids, graph.person_names, graph.person_births,
+                  graph.movie_ids, graph.movie_titles, graph.movie_years):
+        sections.extend([table.offsets, table.data])
+    sections.extend([graph.person_offsets, graph.person_movies,
+                     graph.movie_offsets, graph.movie_stars, graph.name_order,
+                     graph.name_table, graph.name_hashes])
+    return sections
+
+
+def write_snapshot(graph, filename, sources):
+    """
+    Writes a Graph to `filename` as a header, a table of (offset, length)
+    pairs and then every buffer, each aligned to 8 bytes.
+    Writes to a temporary file first so readers never see a partial snapshot.
+    """
+    sections = [memoryview(section).cast("B")
+                for section in graph_sections(graph)]
+    table = struct.Struct(f"={2 * len(sections)}q")
+    offset = HEADER.size + table.size
+    positions = []
+    for section in sections:
+        offset += -offset % 8
+        positions.extend([offset, len(section)])
+        offset += len(section)
+
+    temporary = f"{filename}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDER, *sources,
+                                len(sections)))
+            f.write(table.pack(*positions))
+            for section, position in zip(sections, positions[::2]):
+                f.write(bytes(position - f.tell()))
+                f.write(section)
+        os.replace(temporary, filename)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def read_snapshot(filename, sources):
+    """
+    Maps a snapshot written by write_snapshot into memory.
+    Returns None if there is no usable snapshot for the given sources.
+
+    The Graph's buffers are views straight into the mapped file, so
+    opening a snapshot costs nothing per person or movie.
+    """
+    try:
+        with open(filename, "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    view = memoryview(buffer)
+    if len(view) < HEADER.size:
+        return None
+    magic, version, byte_order, *header = HEADER.unpack_from(view)
+    if (magic, version, byte_order) != (MAGIC, VERSION, BYTE_ORDER):
+        return None
+    if tuple(header[:-1]) != sources:
+        return None
+
+    # A truncated or damaged file must not pass for a snapshot: every
+    # section has to lie within it and hold whole items
+    if header[-1] != len(SECTION_ITEMS):
+        return None
+    table = struct.Struct(f"={2 * header[-1]}q")
+    if len(view) < HEADER.size + table.size:
+        return None
+    positions = table.unpack_from(view, HEADER.size)
+    sections = []
+    for offset, length, size in zip(positions[::2], positions[1::2],
+                                    SECTION_ITEMS):
+        if (offset < 0 or length < 0 or offset + length > len(view)
+                or length % size):
+            return None
+        sections.append(view[offset:offset + length])
+    tables = [StringTable(sections[i].cast("i"), sections[i + 1])
+              for i in range(0, 12, 2)]
+    arrays = [section.cast("i") for section in sections[12:-1]]
+    return Graph(*tables, *arrays, sections[-1].cast("I"))
+
+
+def build_landmarks(graph, k):
+    """
+    Picks the `k` people with the most movies as landmarks,
+    and computes the distances from each of them to everyone.
+    """
+    people = sorted(
+        range(len(graph.person_ids)),
+        key=lambda person: (graph.person_offsets[person + 1]
+                            - graph.person_offsets[person]),
+        reverse=True
+    )[:k]
+    distances = bytearray()
+    for person in people:
+        distances += graph.distances_from(person)
+    return Landmarks(array("i", people), distances, len(graph.person_ids))
+
+
+def write_landmarks(landmarks, directory):
+    """Writes a landmark index next to the CSV files in `directory`."""
+    filename = os.path.join(directory, LANDMARKS)
+    temporary = f"{filename}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            f.write(LANDMARK_HEADER.pack(
+                LANDMARK_MAGIC, LANDMARK_VERSION, BYTE_ORDER,
+                *fingerprint(directory),
+                len(landmarks.landmarks), landmarks.people
+            ))
+            f.write(landmarks.landmarks.tobytes())
+            f.write(landmarks.distances)
+        os.replace(temporary, filename)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def load_landmarks(directory, graph):
+    """
+    Maps the landmark index in `directory` into memory, for use with the
+    Graph loaded from the same directory. Returns None if there is none,
+    or it was built from other CSV files or is damaged.
+    """
+    try:
+        with open(os.path.join(directory, LANDMARKS), "rb") as f:
+            buffer = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+
+    view = memoryview(buffer)
+    if len(view) < LANDMARK_HEADER.size:
+        return None
+    magic, version, byte_order, *header = LANDMARK_HEADER.unpack_from(view)
+    if (magic, version, byte_order) != (
+        LANDMARK_MAGIC, LANDMARK_VERSION, BYTE_ORDER
+    ):
+        return None
+    *sources, k, people = header
+    if tuple(sources) != fingerprint(directory):
+        return None
+
+    # A truncated or damaged index must not pass for one: it has to hold
+    # exactly k landmarks and a row of distances to each of the graph's
+    # people from every one of them
+    start = LANDMARK_HEADER.size
+    if (people != len(graph.person_ids)
+            or len(view) != start + 4 * k + k * people):
+        return None
+    landmarks = view[start:start + 4 * k].cast("i")
+    if any(not 0 <= landmark < people for landmark in landmarks):
+        return None
+    distances = view[start + 4 * k:]
+    return Landmarks(landmarks, distances, people)
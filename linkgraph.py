@@ -0,0 +1,384 @@
+import bisect
+import multiprocessing
+import os
+import posixpath
+import re
+import struct
+from array import array
+from collections import deque
+
+# Links in an HTML page
+LINK = re.compile(rb"<a\s+(?:[^>]*?)href=\"([^\"]*)\"")
+
+# Bytes of a page read at a time while looking for its links
+CHUNK = 1 << 16
+
+# Pages parsed by a worker at a time in crawl_graph
+BATCH = 64
+
+# Name of the crawl and ranks saved in a corpus directory between runs
+STATE = "pagerank.state"
+
+# State header: magic, format version, a byte-order check, then how many
+# sections follow
+HEADER = struct.Struct("=8sIII")
+MAGIC = b"PAGERANK"
+VERSION = 1
+BYTE_ORDER = 0x01020304
+
+# Item size in bytes of each state section: the page names, the link
+# offsets and links, the page stamps, the missing page names, the broken
+# link offsets and broken links, and the ranks
+SECTION_ITEMS = (1, 4, 4, 8, 1, 4, 4, 8)
+
+
+class LinkGraph():
+    """
+    Pages interned to dense integers, in sorted order of their names, with
+    the links stored as compressed sparse rows: the pages that page `p`
+    links to are `links[offsets[p]:offsets[p + 1]]`, in increasing order.
+    """
+
+    def __init__(self, pages, offsets, links):
+        self.pages = pages
+        self.offsets = offsets
+        self.links = links
+
+    def __len__(self):
+        return len(self.pages)
+
+    def page(self, name):
+        """Returns the integer index of the page called `name`."""
+        p = bisect.bisect_left(self.pages, name)
+        if p == len(self.pages) or self.pages[p] != name:
+            raise KeyError(name)
+        return p
+
+    def links_from(self, p):
+        """Returns the pages that page `p` links to."""
+        return self.links[self.offsets[p]:self.offsets[p + 1]]
+
+    def out_degree(self, p):
+        return self.offsets[p + 1] - self.offsets[p]
+
+
+def link_graph(corpus):
+    """
+    Returns the LinkGraph of a corpus given as a dictionary from each page
+    to the set of pages it links to, as returned by pagerank.crawl.
+    Links to pages outside the corpus and links from a page to itself
+    are dropped.
+    """
+    pages = sorted(corpus)
+    index = {name: p for p, name in enumerate(pages)}
+    offsets = array("i", [0])
+    links = array("i")
+    for p, name in enumerate(pages):
+        links.extend(sorted(
+            index[link] for link in set(corpus[name])
+            if link in index and index[link] != p
+        ))
+        offsets.append(len(links))
+    return LinkGraph(pages, offsets, links)
+
+
+class Crawl():
+    """
+    A LinkGraph with what crawl_pages needs to bring it up to date: the
+    modification time and size of page `p` when it was parsed, in
+    `stamps[2 * p]` and `stamps[2 * p + 1]`, and the links from each page
+    to HTML pages missing from the corpus, which become links of the graph
+    if those pages are added. The missing pages that page `p` links to are
+    `missing[b]` for b in `broken[broken_offsets[p]:broken_offsets[p + 1]]`.
+    """
+
+    def __init__(self, graph, stamps, missing, broken_offsets, broken):
+        self.graph = graph
+        self.stamps = stamps
+        self.missing = missing
+        self.broken_offsets = broken_offsets
+        self.broken = broken
+
+    def targets(self, p):
+        """Returns the names of all the pages that page `p` links to."""
+        graph = self.graph
+        start, end = self.broken_offsets[p], self.broken_offsets[p + 1]
+        return ({graph.pages[q] for q in graph.links_from(p)}
+                | {self.missing[b] for b in self.broken[start:end]})
+
+
+def crawl_graph(directory, workers=None):
+    """
+    Returns the LinkGraph of the HTML pages in `directory` and its
+    subdirectories, named by their paths relative to it with "/" between
+    directories. Links are followed relative to the page they are on, and
+    only links to other pages of the corpus are kept.
+
+    Pages are parsed in batches on a pool of `workers` processes (by
+    default, one per CPU), or in this process if `workers` is 1, with
+    only a few batches per worker waiting to be added to the graph
+    at any time.
+    """
+    return crawl_pages(directory, workers).graph
+
+
+def crawl_pages(directory, workers=None, previous=None):
+    """
+    Returns the Crawl of the HTML pages in `directory`, parsed as
+    described in crawl_graph.
+
+    Given the `previous` Crawl of the same directory, only the pages that
+    are new, or whose modification time or size has changed, are parsed;
+    the links of the others are carried over.
+    """
+    pages = find_pages(directory)
+    stamps = page_stamps(directory, pages)
+    index = {name: p for p, name in enumerate(pages)}
+    kept = kept_pages(previous, pages, stamps)
+    parsed = parse_pages(
+        directory, [name for name, q in zip(pages, kept) if q < 0], workers
+    )
+
+    # Rows of unchanged pages are copied as they are if no page has been
+    # added or removed, and otherwise renumbered through their names
+    same_pages = previous is not None and previous.graph.pages == pages
+    missing = dict()
+    offsets = array("i", [0])
+    links = array("i")
+    broken_offsets = array("i", [0])
+    broken = array("i")
+    for p, q in enumerate(kept):
+        if same_pages and q >= 0:
+            links.extend(previous.graph.links_from(q))
+            targets = [previous.missing[b] for b in previous.broken[
+                previous.broken_offsets[q]:previous.broken_offsets[q + 1]
+            ]]
+        else:
+            targets = next(parsed) if q < 0 else previous.targets(q)
+            links.extend(sorted(
+                {index[t] for t in targets if t in index} - {p}
+            ))
+        broken.extend(sorted(
+            missing.setdefault(t, len(missing)) for t in targets
+            if t not in index and t.endswith(".html")
+        ))
+        offsets.append(len(links))
+        broken_offsets.append(len(broken))
+    graph = LinkGraph(pages, offsets, links)
+    return Crawl(graph, stamps, list(missing), broken_offsets, broken)
+
+
+def kept_pages(previous, pages, stamps):
+    """
+    Returns, for each of `pages`, its index in the `previous` Crawl if it
+    is unchanged since then, and otherwise -1.
+    """
+    if previous is None:
+        return [-1] * len(pages)
+    old = {name: q for q, name in enumerate(previous.graph.pages)}
+    kept = []
+    for p, name in enumerate(pages):
+        q = old.get(name, -1)
+        if q >= 0 and (stamps[2 * p:2 * p + 2]
+                       != previous.stamps[2 * q:2 * q + 2]):
+            q = -1
+        kept.append(q)
+    return kept
+
+
+def find_pages(directory):
+    """
+    Returns the sorted names of the HTML pages in `directory` and its
+    subdirectories, relative to `directory`.
+    """
+    pages = []
+    for root, _, filenames in os.walk(directory):
+        folder = os.path.relpath(root, directory)
+        prefix = "" if folder == os.curdir else "/".join(
+            folder.split(os.sep) + [""]
+        )
+        pages.extend(
+            prefix + filename for filename in filenames
+            if filename.endswith(".html")
+        )
+    pages.sort()
+    return pages
+
+
+def page_stamps(directory, pages):
+    """
+    Returns the modification time and size of each of `pages`, one after
+    the other, as Crawl.stamps does.
+    """
+    root = os.path.join(directory, "")
+    stamps = array("q")
+    for name in pages:
+        stat = os.stat(root + name)
+        stamps.extend([stat.st_mtime_ns, stat.st_size])
+    return stamps
+
+
+def parse_pages(directory, pages, workers=None):
+    """
+    Yields the links of each of `pages` in turn, as found by page_links,
+    parsing them as described in crawl_graph.
+    """
+    batches = (pages[i:i + BATCH] for i in range(0, len(pages), BATCH))
+    workers = workers or os.cpu_count() or 1
+    if workers == 1:
+        for batch in batches:
+            yield from batch_links(directory, batch)
+        return
+
+    with multiprocessing.Pool(workers) as pool:
+        pending = deque()
+        for batch in batches:
+            pending.append(pool.apply_async(batch_links, (directory, batch)))
+            if len(pending) > 2 * workers:
+                yield from pending.popleft().get()
+        while pending:
+            yield from pending.popleft().get()
+
+
+def batch_links(directory, names):
+    """Returns the links of each of the pages called `names`."""
+    return [page_links(directory, name) for name in names]
+
+
+def page_links(directory, name):
+    """
+    Returns the set of page names that the page called `name` links to.
+
+    The page is read CHUNK bytes at a time, and the tag cut off at the
+    end of each chunk is carried over to the next, so that a page of
+    any size is parsed in bounded memory. A tag longer than CHUNK bytes
+    is skipped.
+    """
+    hrefs = set()
+    text = b""
+    with open(os.path.join(directory, name), "rb") as f:
+        while True:
+            chunk = f.read(CHUNK)
+            text += chunk
+            end = text.rfind(b"<") if chunk else len(text)
+            if end == -1 or len(text) - end > CHUNK:
+                end = len(text)
+            hrefs.update(LINK.findall(text, 0, end))
+            if not chunk:
+                break
+            text = text[end:]
+
+    folder = posixpath.dirname(name)
+    prefix = folder + "/" if folder else ""
+    links = set()
+    for href in hrefs:
+        href = href.decode("utf-8", "surrogateescape")
+        if "/" in href or href in (".", ".."):
+            links.add(posixpath.normpath(posixpath.join(folder, href)))
+        else:
+            links.add(prefix + href)
+    return links
+
+
+def write_state(crawl, ranks, filename):
+    """
+    Writes a Crawl and the ranks of its pages to `filename` as a header,
+    a table of (offset, length) pairs and then every section, each
+    aligned to 8 bytes. Writes to a temporary file first so readers never
+    see a partial state.
+    """
+    sections = [memoryview(section).cast("B") for section in [
+        join_names(crawl.graph.pages), crawl.graph.offsets, crawl.graph.links,
+        crawl.stamps, join_names(crawl.missing), crawl.broken_offsets,
+        crawl.broken, array("d", ranks)
+    ]]
+    table = struct.Struct(f"={2 * len(sections)}q")
+    offset = HEADER.size + table.size
+    positions = []
+    for section in sections:
+        offset += -offset % 8
+        positions.extend([offset, len(section)])
+        offset += len(section)
+
+    temporary = f"{filename}.{os.getpid()}.tmp"
+    try:
+        with open(temporary, "wb") as f:
+            f.write(HEADER.pack(MAGIC, VERSION, BYTE_ORDER, len(sections)))
+            f.write(table.pack(*positions))
+            for section, position in zip(sections, positions[::2]):
+                f.write(bytes(position - f.tell()))
+                f.write(section)
+        os.replace(temporary, filename)
+    finally:
+        if os.path.exists(temporary):
+            os.remove(temporary)
+
+
+def read_state(filename):
+    """
+    Reads a Crawl and the ranks of its pages, as an array, from a state
+    written by write_state. Returns None if there is no usable state.
+    """
+    try:
+        with open(filename, "rb") as f:
+            data = f.read()
+    except OSError:
+        return None
+
+    if len(data) < HEADER.size:
+        return None
+    magic, version, byte_order, count = HEADER.unpack_from(data)
+    if (magic, version, byte_order, count) != (MAGIC, VERSION, BYTE_ORDER,
+                                               len(SECTION_ITEMS)):
+        return None
+    table = struct.Struct(f"={2 * count}q")
+    if len(data) < HEADER.size + table.size:
+        return None
+    positions = table.unpack_from(data, HEADER.size)
+    sections = []
+    for offset, length, size in zip(positions[::2], positions[1::2],
+                                    SECTION_ITEMS):
+        if (offset < 0 or length < 0 or offset + length > len(data)
+                or length % size):
+            return None
+        sections.append(data[offset:offset + length])
+
+    pages, missing = split_names(sections[0]), split_names(sections[4])
+    offsets, links, broken_offsets, broken = (
+        array("i", sections[i]) for i in (1, 2, 5, 6)
+    )
+    stamps, ranks = array("q", sections[3]), array("d", sections[7])
+
+    # A damaged state must not pass for one: every row has to lie within
+    # its links and point at an existing page
+    n = len(pages)
+    if (len(offsets) != n + 1 or len(broken_offsets) != n + 1
+            or len(stamps) != 2 * n or len(ranks) != n
+            or not valid_rows(offsets, links, n)
+            or not valid_rows(broken_offsets, broken, len(missing))):
+        return None
+    graph = LinkGraph(pages, offsets, links)
+    return Crawl(graph, stamps, missing, broken_offsets, broken), ranks
+
+
+def valid_rows(offsets, items, size):
+    """
+    Checks if `offsets` divide `items` into rows, in order, and every item
+    is below `size`.
+    """
+    return (offsets[0] == 0 and offsets[-1] == len(items)
+            and all(a <= b for a, b in zip(offsets, offsets[1:]))
+            and min(items, default=0) >= 0
+            and max(items, default=-1) < size)
+
+
+def join_names(names):
+    """Returns page names as bytes, each followed by a NUL."""
+    return b"".join(name.encode("utf-8", "surrogateescape") + b"\0"
+                    for name in names)
+
+
+def split_names(data):
+    """Returns the page names packed into bytes by join_names."""
+    return [name.decode("utf-8", "surrogateescape")
+            for name in bytes(data).split(b"\0")[:-1]]
@@ -1,10 +1,89 @@
+import inspect
 import itertools
-
-
-class Sentence():
-
-    def evaluate(self, model):
-        """Evaluates the logical sentence."""
+import multiprocessing
+import os
+import weakref
+
+from sat import Solver
+
+# Every sentence in use, keyed by its class and its (interned) parts
+SENTENCES = weakref.WeakValueDictionary()
+
+# Attributes still set on sealed sentences, as they are worked out
+CACHED = {"hash_value", "symbol_set", "formula_text"}
+
+# Knowledge base, query, symbols, split_bits and whether any part is
+# repeated, in a worker process of parallel_check
+split_problem = None
+
+
+class Interned(type):
+    """
+    Makes sentences hash-consed: building a sentence equal to one that
+    already exists returns that one, so equal subsentences are a single
+    object, whose hash, symbols and formula are worked out only once.
+
+    Interned sentences are sealed, so they can't be changed. And is the
+    exception, since knowledge bases are built up with And.add: each
+    And() is a new sentence that can be added to until it becomes part
+    of another sentence, which seals it too.
+    """
+
+    def __call__(cls, *args, **kwargs):
+        if kwargs:
+            # Keyword arguments are put in order, so that a sentence is the
+            # same object however its parts were passed
+            bound = inspect.signature(cls.__init__).bind(None, *args, **kwargs)
+            args = bound.args[1:]
+        args = tuple(share(arg) for arg in args)
+        if not cls.interned:
+            return super().__call__(*args)
+        key = (cls, args)
+        try:
+            sentence = SENTENCES.get(key)
+        except TypeError:
+            return super().__call__(*args)
+        if sentence is None:
+            sentence = super().__call__(*args)
+            object.__setattr__(sentence, "sealed", True)
+            SENTENCES[key] = sentence
+        return sentence
+
+
+def share(part):
+    """
+    Seals an And that is becoming part of another sentence, and returns
+    the interned sentence equal to `part` (or `part` itself).
+    """
+    if not isinstance(part, And) or part.sealed:
+        return part
+    object.__setattr__(part, "conjuncts", tuple(part.conjuncts))
+    object.__setattr__(part, "sealed", True)
+    return SENTENCES.setdefault((And, part.conjuncts), part)
+
+
+class Sentence(metaclass=Interned):
+
+    interned = True
+
+    # Whether the sentence can no longer be changed
+    sealed = False
+
+    # Worked out on first use, and kept since sentences don't change
+    hash_value = None
+    symbol_set = None
+    formula_text = None
+
+    def __setattr__(self, name, value):
+        if self.sealed and name not in CACHED:
+            raise AttributeError("sentence can't be changed")
+        object.__setattr__(self, name, value)
+
+    def evaluate(self, model, cache=None):
+        """
+        Evaluates the logical sentence. Given a `cache` dict, any
+        subsentence appearing more than once is evaluated only once.
+        """
         raise Exception("nothing to evaluate")
 
     def formula(self):
@@ -15,6 +94,13 @@ class Sentence():
         """Returns a set of all symbols in the logical sentence."""
         return set()
 
+    def expression(self, bits):
+        """
+        Returns Python source evaluating the logical sentence in a model
+        `m`, an integer with bit `bits[name]` set if symbol `name` is true.
+        """
+        raise Exception("nothing to evaluate")
+
     @classmethod
     def validate(cls, sentence):
         if not isinstance(sentence, Sentence):
@@ -51,12 +137,14 @@ class Symbol(Sentence):
         return isinstance(other, Symbol) and self.name == other.name
 
     def __hash__(self):
-        return hash(("symbol", self.name))
+        if self.hash_value is None:
+            self.hash_value = hash(("symbol", self.name))
+        return self.hash_value
 
     def __repr__(self):
         return self.name
 
-    def evaluate(self, model):
+    def evaluate(self, model, cache=None):
         try:
             return bool(model[self.name])
         except KeyError:
@@ -68,6 +156,12 @@ class Symbol(Sentence):
     def symbols(self):
         return {self.name}
 
+    def expression(self, bits):
+        try:
+            return f"(m & {1 << bits[self.name]})"
+        except KeyError:
+            raise Exception(f"variable {self.name} not in model")
+
 
 class Not(Sentence):
     def __init__(self, operand):
@@ -75,37 +169,63 @@ class Not(Sentence):
         self.operand = operand
 
     def __eq__(self, other):
-        return isinstance(other, Not) and self.operand == other.operand
+        return self is other or (
+            isinstance(other, Not) and self.operand == other.operand
+        )
 
     def __hash__(self):
-        return hash(("not", hash(self.operand)))
+        if self.hash_value is None:
+            self.hash_value = hash(("not", hash(self.operand)))
+        return self.hash_value
 
     def __repr__(self):
         return f"Not({self.operand})"
 
-    def evaluate(self, model):
-        return not self.operand.evaluate(model)
+    def evaluate(self, model, cache=None):
+        if cache is None:
+            return not self.operand.evaluate(model)
+        key = id(self)
+        if key not in cache:
+            cache[key] = not self.operand.evaluate(model, cache)
+        return cache[key]
 
     def formula(self):
-        return "¬" + Sentence.parenthesize(self.operand.formula())
+        if self.formula_text is None:
+            self.formula_text = (
+                "¬" + Sentence.parenthesize(self.operand.formula())
+            )
+        return self.formula_text
 
     def symbols(self):
-        return self.operand.symbols()
+        if self.symbol_set is None:
+            self.symbol_set = frozenset(self.operand.symbols())
+        return set(self.symbol_set)
+
+    def expression(self, bits):
+        return f"(not {self.operand.expression(bits)})"
 
 
 class And(Sentence):
+
+    interned = False
+
     def __init__(self, *conjuncts):
         for conjunct in conjuncts:
             Sentence.validate(conjunct)
         self.conjuncts = list(conjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, And) and self.conjuncts == other.conjuncts
+        return self is other or (
+            isinstance(other, And)
+            and tuple(self.conjuncts) == tuple(other.conjuncts)
+        )
 
     def __hash__(self):
-        return hash(
-            ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
-        )
+        if self.hash_value is None:
+            self.hash_value = hash(
+                ("and", tuple(hash(conjunct) for conjunct in self.conjuncts))
+            )
+        return self.hash_value
 
     def __repr__(self):
         conjunctions = ", ".join(
@@ -114,51 +234,111 @@ class And(Sentence):
         return f"And({conjunctions})"
 
     def add(self, conjunct):
+        if self.sealed:
+            raise TypeError("cannot add to a sentence inside another")
         Sentence.validate(conjunct)
-        self.conjuncts.append(conjunct)
-
-    def evaluate(self, model):
-        return all(conjunct.evaluate(model) for conjunct in self.conjuncts)
+        self.conjuncts.append(share(conjunct))
+        self.hash_value = None
+        self.symbol_set = None
+        self.formula_text = None
+
+    def evaluate(self, model, cache=None):
+        if cache is None:
+            return all(conjunct.evaluate(model)
+                       for conjunct in self.conjuncts)
+        key = id(self)
+        if key not in cache:
+            cache[key] = all(conjunct.evaluate(model, cache)
+                             for conjunct in self.conjuncts)
+        return cache[key]
 
     def formula(self):
-        if len(self.conjuncts) == 1:
-            return self.conjuncts[0].formula()
-        return " ∧ ".join([Sentence.parenthesize(conjunct.formula())
-                           for conjunct in self.conjuncts])
+        if self.formula_text is None:
+            if len(self.conjuncts) == 1:
+                self.formula_text = self.conjuncts[0].formula()
+            else:
+                self.formula_text = " ∧ ".join(
+                    [Sentence.parenthesize(conjunct.formula())
+                     for conjunct in self.conjuncts]
+                )
+        return self.formula_text
 
     def symbols(self):
-        return set.union(*[conjunct.symbols() for conjunct in self.conjuncts])
+        if self.symbol_set is None:
+            self.symbol_set = frozenset().union(
+                *[conjunct.symbols() for conjunct in self.conjuncts]
+            )
+        return set(self.symbol_set)
+
+    def expression(self, bits):
+        if not self.conjuncts:
+            return "True"
+        return "(" + " and ".join(
+            [conjunct.expression(bits) for conjunct in self.conjuncts]
+        ) + ")"
 
 
 class Or(Sentence):
+    """
+    Unlike an And, an Or is interned and can't be changed, so its
+    disjuncts are a tuple rather than a list.
+    """
+
     def __init__(self, *disjuncts):
         for disjunct in disjuncts:
             Sentence.validate(disjunct)
-        self.disjuncts = list(disjuncts)
+        self.disjuncts = tuple(disjuncts)
 
     def __eq__(self, other):
-        return isinstance(other, Or) and self.disjuncts == other.disjuncts
+        return self is other or (
+            isinstance(other, Or) and self.disjuncts == other.disjuncts
+        )
 
     def __hash__(self):
-        return hash(
-            ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
-        )
+        if self.hash_value is None:
+            self.hash_value = hash(
+                ("or", tuple(hash(disjunct) for disjunct in self.disjuncts))
+            )
+        return self.hash_value
 
     def __repr__(self):
         disjuncts = ", ".join([str(disjunct) for disjunct in self.disjuncts])
         return f"Or({disjuncts})"
 
-    def evaluate(self, model):
-        return any(disjunct.evaluate(model) for disjunct in self.disjuncts)
+    def evaluate(self, model, cache=None):
+        if cache is None:
+            return any(disjunct.evaluate(model)
+                       for disjunct in self.disjuncts)
+        key = id(self)
+        if key not in cache:
+            cache[key] = any(disjunct.evaluate(model, cache)
+                             for disjunct in self.disjuncts)
+        return cache[key]
 
     def formula(self):
-        if len(self.disjuncts) == 1:
-            return self.disjuncts[0].formula()
-        return " ∨  ".join([Sentence.parenthesize(disjunct.formula())
-                            for disjunct in self.disjuncts])
+        if self.formula_text is None:
+            if len(self.disjuncts) == 1:
+                self.formula_text = self.disjuncts[0].formula()
+            else:
+                self.formula_text = " ∨  ".join(
+                    [Sentence.parenthesize(disjunct.formula())
+                     for disjunct in self.disjuncts]
+                )
+        return self.formula_text
 
     def symbols(self):
-        return set.union(*[disjunct.symbols() for disjunct in self.disjuncts])
+        if self.symbol_set is None:
+            self.symbol_set = frozenset().union(
+                *[disjunct.symbols() for disjunct in self.disjuncts]
+            )
+        return set(self.symbol_set)
+
+    def expression(self, bits):
+        if not self.disjuncts:
+            return "False"
+        return "(" + " or ".join(
+            [disjunct.expression(bits) for disjunct in self.disjuncts]
+        ) + ")"
 
 
 class Implication(Sentence):
@@ -169,27 +349,50 @@ class Implication(Sentence):
         self.consequent = consequent
 
     def __eq__(self, other):
-        return (isinstance(other, Implication)
-                and self.antecedent == other.antecedent
-                and self.consequent == other.consequent)
+        return self is other or (
+            isinstance(other, Implication)
+            and self.antecedent == other.antecedent
+            and self.consequent == other.consequent
+        )
 
     def __hash__(self):
-        return hash(("implies", hash(self.antecedent), hash(self.consequent)))
+        if self.hash_value is None:
+            self.hash_value = hash(
+                ("implies", hash(self.antecedent), hash(self.consequent))
+            )
+        return self.hash_value
 
     def __repr__(self):
         return f"Implication({self.antecedent}, {self.consequent})"
 
-    def evaluate(self, model):
-        return ((not self.antecedent.evaluate(model))
-                or self.consequent.evaluate(model))
+    def evaluate(self, model, cache=None):
+        if cache is None:
+            return ((not self.antecedent.evaluate(model))
+                    or self.consequent.evaluate(model))
+        key = id(self)
+        if key not in cache:
+            cache[key] = ((not self.antecedent.evaluate(model, cache))
+                          or self.consequent.evaluate(model, cache))
+        return cache[key]
 
     def formula(self):
-        antecedent = Sentence.parenthesize(self.antecedent.formula())
-        consequent = Sentence.parenthesize(self.consequent.formula())
-        return f"{antecedent} => {consequent}"
+        if self.formula_text is None:
+            antecedent = Sentence.parenthesize(self.antecedent.formula())
+            consequent = Sentence.parenthesize(self.consequent.formula())
+            self.formula_text = f"{antecedent} => {consequent}"
+        return self.formula_text
 
     def symbols(self):
-        return set.union(self.antecedent.symbols(), self.consequent.symbols())
+        if self.symbol_set is None:
+            self.symbol_set = frozenset().union(
+                self.antecedent.symbols(), self.consequent.symbols()
+            )
+        return set(self.symbol_set)
+
+    def expression(self, bits):
+        antecedent = self.antecedent.expression(bits)
+        consequent = self.consequent.expression(bits)
+        return f"(not {antecedent} or {consequent})"
 
 
 class Biconditional(Sentence):
@@ -200,64 +403,971 @@ class Biconditional(Sentence):
         self.right = right
 
     def __eq__(self, other):
-        return (isinstance(other, Biconditional)
-                and self.left == other.left
-                and self.right == other.right)
+        return self is other or (
+            isinstance(other, Biconditional)
+            and self.left == other.left
+            and self.right == other.right
+        )
 
     def __hash__(self):
-        return hash(("biconditional", hash(self.left), hash(self.right)))
+        if self.hash_value is None:
+            self.hash_value = hash(
+                ("biconditional", hash(self.left), hash(self.right))
+            )
+        return self.hash_value
 
     def __repr__(self):
         return f"Biconditional({self.left}, {self.right})"
 
-    def evaluate(self, model):
-        return ((self.left.evaluate(model)
-                 and self.right.evaluate(model))
-                or (not self.left.evaluate(model)
-                    and not self.right.evaluate(model)))
+    def evaluate(self, model, cache=None):
+        if cache is None:
+            return self.left.evaluate(model) == self.right.evaluate(model)
+        key = id(self)
+        if key not in cache:
+            cache[key] = (self.left.evaluate(model, cache)
+                          == self.right.evaluate(model, cache))
+        return cache[key]
 
     def formula(self):
-        left = Sentence.parenthesize(str(self.left))
-        right = Sentence.parenthesize(str(self.right))
-        return f"{left} <=> {right}"
+        if self.formula_text is None:
+            left = Sentence.parenthesize(str(self.left))
+            right = Sentence.parenthesize(str(self.right))
+            self.formula_text = f"{left} <=> {right}"
+        return self.formula_text
 
     def symbols(self):
-        return set.union(self.left.symbols(), self.right.symbols())
-
-
-def model_check(knowledge, query):
-    """Checks if knowledge base entails query."""
+        if self.symbol_set is None:
+            self.symbol_set = frozenset().union(
+                self.left.symbols(), self.right.symbols()
+            )
+        return set(self.symbol_set)
+
+    def expression(self, bits):
+        left = self.left.expression(bits)
+        right = self.right.expression(bits)
+        return f"((not {left}) == (not {right}))"
+
+
+def model_check(knowledge, query, backend="enumerate"):
+    """
+    Checks if knowledge base entails query, using the named backend
+    from BACKENDS ("enumerate" tries every model).
+    """
+    if backend != "enumerate":
+        return BACKENDS[backend](knowledge, query)
 
-    def check_all(knowledge, query, symbols, model):
-        """Checks if knowledge base entails query, given a particular model."""
+    # Get all symbols in both knowledge and query
+    symbols = set.union(knowledge.symbols(), query.symbols())
 
-        # If model has an assignment for each symbol
-        if not symbols:
+    # Caching evaluations only pays if some subsentence is repeated
+    shared = repeats_parts(knowledge, query)
 
-            # If knowledge base is true in model, then query must also be true
-            if knowledge.evaluate(model):
-                return query.evaluate(model)
+    # Check that knowledge entails query
+    return check_all(knowledge, query, symbols, dict(), shared)
+
+
+def check_all(knowledge, query, symbols, model, shared=False):
+    """Checks if knowledge base entails query, given a particular model."""
+
+    # If model has an assignment for each symbol
+    if not symbols:
+
+        # Subsentences appearing more than once are evaluated once
+        cache = dict() if shared else None
+
+        # If knowledge base is true in model, then query must also be true
+        if knowledge.evaluate(model, cache):
+            return query.evaluate(model, cache)
+        return True
+    else:
+
+        # Choose one of the remaining unused symbols
+        remaining = symbols.copy()
+        p = remaining.pop()
+
+        # Create a model where the symbol is true
+        model_true = model.copy()
+        model_true[p] = True
+
+        # Create a model where the symbol is false
+        model_false = model.copy()
+        model_false[p] = False
+
+        # Ensure entailment holds in both models
+        return (check_all(knowledge, query, remaining, model_true, shared) and
+                check_all(knowledge, query, remaining, model_false, shared))
+
+
+def parallel_check(knowledge, query, workers=None, split_bits=None):
+    """
+    Checks if knowledge base entails query like model_check, but on a
+    pool of `workers` processes (by default, one per CPU). The models
+    are split on the values of the first `split_bits` symbols into
+    independent subproblems, and the pool is stopped as soon as any of
+    them has a model where knowledge holds but query does not.
+    """
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    workers = workers or os.cpu_count() or 1
+
+    # A few subproblems per worker, so that they finish close together
+    if split_bits is None:
+        split_bits = (4 * workers - 1).bit_length()
+    split_bits = min(split_bits, len(symbols))
+
+    problem = (knowledge, query, symbols, split_bits,
+               repeats_parts(knowledge, query))
+    with multiprocessing.Pool(workers, initializer=start_worker,
+                              initargs=(problem,)) as pool:
+        for entailed in pool.imap_unordered(check_part,
+                                            range(2 ** split_bits)):
+            if not entailed:
+                return False
+    return True
+
+
+def start_worker(problem):
+    """Sets up a worker process of parallel_check."""
+    global split_problem
+    split_problem = problem
+
+
+def check_part(part):
+    """
+    Checks one subproblem of parallel_check: the models in which symbol
+    i, for i below split_bits, is true if bit i of `part` is set.
+    """
+    knowledge, query, symbols, split_bits, shared = split_problem
+    model = {symbols[i]: bool(part >> i & 1) for i in range(split_bits)}
+    return check_all(knowledge, query, set(symbols[split_bits:]), model,
+                     shared)
+
+
+def repeats_parts(*sentences):
+    """
+    Checks if any compound subsentence appears more than once among
+    `sentences`, which, being interned, means as the same object.
+    """
+    seen = set()
+    stack = list(sentences)
+    while stack:
+        sentence = stack.pop()
+        if isinstance(sentence, Symbol):
+            continue
+        if id(sentence) in seen:
             return True
+        seen.add(id(sentence))
+        if isinstance(sentence, Not):
+            stack.append(sentence.operand)
+        elif isinstance(sentence, And):
+            stack.extend(sentence.conjuncts)
+        elif isinstance(sentence, Or):
+            stack.extend(sentence.disjuncts)
+        elif isinstance(sentence, Implication):
+            stack.extend([sentence.antecedent, sentence.consequent])
+        elif isinstance(sentence, Biconditional):
+            stack.extend([sentence.left, sentence.right])
+    return False
+
+
+def compile_sentence(sentence, bits):
+    """
+    Compiles a sentence into a function of a model `m`, an integer with
+    bit `bits[name]` set if symbol `name` is true, returning whether the
+    sentence is true in that model.
+    """
+    return eval(f"lambda m: {sentence.expression(bits)}")
+
+
+def compiled_check(knowledge, query):
+    """
+    Checks if knowledge base entails query, like model_check, but by
+    compiling both into one function and counting through the models as
+    integers rather than building a dict for each one.
+
+    Sentences nested too deeply for Python to compile are checked
+    by model_check instead.
+    """
+    symbols = sorted(set.union(knowledge.symbols(), query.symbols()))
+    bits = {name: i for i, name in enumerate(symbols)}
+    # Built from the source of both, since wrapping the knowledge base in
+    # an Implication would seal it against further And.add calls
+    try:
+        entailed = eval(f"lambda m: not {knowledge.expression(bits)} "
+                        f"or {query.expression(bits)}")
+    except (SyntaxError, RecursionError, MemoryError):
+        return model_check(knowledge, query)
+    return all(map(entailed, range(2 ** len(symbols))))
+
+
+def numpy_check(knowledge, query, chunk_bits=20):
+    """
+    Checks if knowledge base entails query by evaluating both over the
+    whole truth table with NumPy, as numpy_entailments does.
+    """
+    return numpy_entailments(knowledge, [query], chunk_bits)[0]
+
+
+def truth_table(sentence, bits, columns, memo):
+    """
+    Returns the packed truth table column of a sentence, given the
+    columns of its symbols, reusing any subsentence already in `memo`.
+    """
+    key = id(sentence)
+    if key in memo:
+        return memo[key][1]
+    if isinstance(sentence, Symbol):
+        column = columns[bits[sentence.name]]
+    elif isinstance(sentence, Not):
+        column = ~truth_table(sentence.operand, bits, columns, memo)
+    elif isinstance(sentence, And):
+        column = columns[0] | ~columns[0]
+        for conjunct in sentence.conjuncts:
+            column = column & truth_table(conjunct, bits, columns, memo)
+    elif isinstance(sentence, Or):
+        column = columns[0] & ~columns[0]
+        for disjunct in sentence.disjuncts:
+            column = column | truth_table(disjunct, bits, columns, memo)
+    elif isinstance(sentence, Implication):
+        column = (~truth_table(sentence.antecedent, bits, columns, memo)
+                  | truth_table(sentence.consequent, bits, columns, memo))
+    elif isinstance(sentence, Biconditional):
+        column = ~(truth_table(sentence.left, bits, columns, memo)
+                   ^ truth_table(sentence.right, bits, columns, memo))
+    else:
+        raise TypeError("must be a logical sentence")
+
+    # Keep the sentence alive with its column, so its id is not reused
+    memo[key] = (sentence, column)
+    return column
+
+
+def cnf(sentence, positive=True):
+    """
+    Converts a sentence (or, if not `positive`, its negation) to
+    conjunctive normal form: a list of clauses, each a frozenset of
+    (symbol name, truth value) literals.
+
+    Negations are pushed down to the symbols and disjunctions distributed
+    over conjunctions, dropping clauses that are always true.
+    """
+    if isinstance(sentence, Symbol):
+        return [frozenset([(sentence.name, positive)])]
+    elif isinstance(sentence, Not):
+        return cnf(sentence.operand, not positive)
+    elif isinstance(sentence, And):
+        parts = sentence.conjuncts
+        conjunction = positive
+    elif isinstance(sentence, Or):
+        parts = sentence.disjuncts
+        conjunction = not positive
+    elif isinstance(sentence, Implication):
+        return cnf(Or(Not(sentence.antecedent), sentence.consequent),
+                   positive)
+    elif isinstance(sentence, Biconditional):
+        left, right = sentence.left, sentence.right
+        return cnf(And(Implication(left, right), Implication(right, left)),
+                   positive)
+    else:
+        raise TypeError("must be a logical sentence")
+
+    # A conjunction of (possibly negated) parts just collects their clauses
+    if conjunction:
+        clauses = []
+        for part in parts:
+            clauses.extend(cnf(part, positive))
+        return list(dict.fromkeys(clauses))
+
+    # A disjunction takes one clause from each part, in every combination
+    clauses = [frozenset()]
+    for part in parts:
+        clauses = list(dict.fromkeys(
+            clause | other
+            for clause in clauses
+            for other in cnf(part, positive)
+            if not any((name, not value) in clause for name, value in other)
+        ))
+    return clauses
+
+
+def simplify(sentence, memo=None):
+    """
+    Returns a sentence equivalent to `sentence` but with less to evaluate:
+    constants folded (the empty And being true and the empty Or false),
+    nested Ands and Ors flattened, repeated parts and double negations
+    dropped, and a conjunction of a part and its negation made false
+    (and a disjunction of them true). Symbols that turn out not to
+    matter may disappear, which doesn't change what is entailed, but
+    does change count_models unless it is given the original symbols.
+    """
+    if memo is None:
+        memo = dict()
+    key = id(sentence)
+    if key in memo:
+        return memo[key][1]
+
+    if isinstance(sentence, Symbol):
+        result = sentence
+    elif isinstance(sentence, Not):
+        result = negation(simplify(sentence.operand, memo))
+    elif isinstance(sentence, (And, Or)):
+        conjunction = isinstance(sentence, And)
+        parts = sentence.conjuncts if conjunction else sentence.disjuncts
+        result = connective(
+            conjunction, [simplify(part, memo) for part in parts]
+        )
+    elif isinstance(sentence, Implication):
+        antecedent = simplify(sentence.antecedent, memo)
+        consequent = simplify(sentence.consequent, memo)
+        if (constant(antecedent) is not None
+                or constant(consequent) is not None
+                or antecedent == consequent):
+            result = connective(False, [negation(antecedent), consequent])
+        else:
+            result = Implication(antecedent, consequent)
+    elif isinstance(sentence, Biconditional):
+        left = simplify(sentence.left, memo)
+        right = simplify(sentence.right, memo)
+        if constant(left) is not None:
+            left, right = right, left
+        if left == right:
+            result = And()
+        elif left == negation(right):
+            result = Or()
+        elif constant(right) is not None:
+            result = left if constant(right) else negation(left)
+        else:
+            result = Biconditional(left, right)
+    else:
+        raise TypeError("must be a logical sentence")
+
+    # Keep the sentence alive with its result, so its id is not reused
+    memo[key] = (sentence, result)
+    return result
+
+
+def constant(sentence):
+    """
+    Returns True for a sentence that is always true (the empty And),
+    False for one that is always false (the empty Or), and otherwise None.
+    """
+    if isinstance(sentence, And) and not sentence.conjuncts:
+        return True
+    if isinstance(sentence, Or) and not sentence.disjuncts:
+        return False
+    return None
+
+
+def negation(sentence):
+    """Returns the negation of an already simplified sentence."""
+    if isinstance(sentence, Not):
+        return sentence.operand
+    value = constant(sentence)
+    if value is None:
+        return Not(sentence)
+    return Or() if value else And()
+
+
+def connective(conjunction, parts):
+    """
+    Returns the conjunction (or disjunction) of already simplified parts,
+    flattened, without repeats, and folded if it is constant.
+    """
+    kind = And if conjunction else Or
+    flat = dict()
+    for part in parts:
+        value = constant(part)
+        if value is conjunction:
+            continue
+        if value is not None:
+            return Or() if conjunction else And()
+        if isinstance(part, kind):
+            flat.update(dict.fromkeys(
+                part.conjuncts if conjunction else part.disjuncts
+            ))
+        else:
+            flat[part] = None
+
+    # A part and its negation make a conjunction false, a disjunction true
+    for part in flat:
+        if isinstance(part, Not) and part.operand in flat:
+            return Or() if conjunction else And()
+    if len(flat) == 1:
+        return next(iter(flat))
+    return kind(*flat)
+
+
+def count_nodes(sentence):
+    """
+    Returns how many nodes a sentence has as a tree, which is how many
+    an evaluation of it visits.
+    """
+    if isinstance(sentence, Symbol):
+        return 1
+    elif isinstance(sentence, Not):
+        return 1 + count_nodes(sentence.operand)
+    elif isinstance(sentence, And):
+        return 1 + sum(count_nodes(part) for part in sentence.conjuncts)
+    elif isinstance(sentence, Or):
+        return 1 + sum(count_nodes(part) for part in sentence.disjuncts)
+    elif isinstance(sentence, Implication):
+        return (1 + count_nodes(sentence.antecedent)
+                + count_nodes(sentence.consequent))
+    elif isinstance(sentence, Biconditional):
+        return 1 + count_nodes(sentence.left) + count_nodes(sentence.right)
+    raise TypeError("must be a logical sentence")
+
+
+class Tseitin():
+    """
+    Converts sentences to conjunctive normal form in linear size, by
+    giving every compound subsentence a new variable defined to be
+    equivalent to it. That variable is named by the (interned)
+    subsentence itself, so a subsentence shared by several sentences,
+    or repeated within one, is only defined once.
+
+    Literals and clauses are as in cnf(). The defining clauses only fix
+    the new variables, so adding them to any set of clauses changes
+    neither whether it is satisfiable nor how many models it has.
+    """
+
+    def __init__(self):
+        self.clauses = []
+        self.literals = dict()
+
+    def literal(self, sentence):
+        """
+        Returns a literal true exactly when the sentence is, adding the
+        clauses defining any new variables it needs to self.clauses.
+        """
+        if isinstance(sentence, Symbol):
+            return (sentence.name, True)
+        if isinstance(sentence, Not):
+            name, value = self.literal(sentence.operand)
+            return (name, not value)
+        if sentence in self.literals:
+            return self.literals[sentence]
+
+        x = (sentence, True)
+        not_x = (sentence, False)
+        if isinstance(sentence, (And, Or, Implication)):
+            if isinstance(sentence, And):
+                parts = [self.literal(part) for part in sentence.conjuncts]
+            elif isinstance(sentence, Or):
+                parts = [self.literal(part) for part in sentence.disjuncts]
+            else:
+                name, value = self.literal(sentence.antecedent)
+                parts = [(name, not value),
+                         self.literal(sentence.consequent)]
+            negated = [(name, not value) for name, value in parts]
+
+            # x is the conjunction of the parts, or is the disjunction
+            if isinstance(sentence, And):
+                self.clauses.extend(frozenset([not_x, part])
+                                    for part in parts)
+                self.clauses.append(frozenset([x] + negated))
+            else:
+                self.clauses.extend(frozenset([x, part])
+                                    for part in negated)
+                self.clauses.append(frozenset([not_x] + parts))
+        elif isinstance(sentence, Biconditional):
+            (left, a), (right, b) = (self.literal(sentence.left),
+                                     self.literal(sentence.right))
+            self.clauses.extend([
+                frozenset([not_x, (left, not a), (right, b)]),
+                frozenset([not_x, (left, a), (right, not b)]),
+                frozenset([x, (left, a), (right, b)]),
+                frozenset([x, (left, not a), (right, not b)])
+            ])
+        else:
+            raise TypeError("must be a logical sentence")
+        self.literals[sentence] = x
+        return x
+
+    def require(self, sentence, positive=True):
+        """
+        Adds clauses to self.clauses that hold exactly when the sentence
+        (or, if not `positive`, its negation) is true. Conjunctions at
+        the top become separate clauses and disjunctions below them
+        single clauses, so new variables are only needed deeper down.
+        """
+        if isinstance(sentence, Not):
+            self.require(sentence.operand, not positive)
+        elif isinstance(sentence, (And, Or)):
+            conjunction = isinstance(sentence, And) == positive
+            parts = (sentence.conjuncts if isinstance(sentence, And)
+                     else sentence.disjuncts)
+            if conjunction:
+                for part in parts:
+                    self.require(part, positive)
+            else:
+                self.clauses.append(frozenset(
+                    self.signed(part, positive) for part in parts
+                ))
+        elif isinstance(sentence, Implication):
+            if positive:
+                self.clauses.append(frozenset([
+                    self.signed(sentence.antecedent, False),
+                    self.signed(sentence.consequent, True)
+                ]))
+            else:
+                self.require(sentence.antecedent, True)
+                self.require(sentence.consequent, False)
         else:
+            self.clauses.append(frozenset([self.signed(sentence, positive)]))
 
-            # Choose one of the remaining unused symbols
-            remaining = symbols.copy()
-            p = remaining.pop()
+    def signed(self, sentence, positive):
+        """Returns the literal of a sentence, or of its negation."""
+        name, value = self.literal(sentence)
+        return (name, value == positive)
 
-            # Create a model where the symbol is true
-            model_true = model.copy()
-            model_true[p] = True
 
-            # Create a model where the symbol is false
-            model_false = model.copy()
-            model_false[p] = False
+def tseitin(sentence):
+    """
+    Converts a sentence to conjunctive normal form like cnf(), but in
+    linear size, with the extra variables of Tseitin: satisfiable
+    exactly when the sentence is, and with one model per model of it.
+    """
+    encoder = Tseitin()
+    encoder.require(sentence)
+    return encoder.clauses
 
-            # Ensure entailment holds in both models
-            return (check_all(knowledge, query, remaining, model_true) and
-                    check_all(knowledge, query, remaining, model_false))
 
-    # Get all symbols in both knowledge and query
-    symbols = set.union(knowledge.symbols(), query.symbols())
+class KnowledgeBase():
+    """
+    A knowledge base that grows over time, answering queries with one
+    SAT solver that is kept between calls.
 
-    # Check that knowledge entails query
-    return check_all(knowledge, query, symbols, dict())
+    Each sentence added is converted to clauses by Tseitin, as it is at
+    the time, and given to the solver, which keeps its clauses, what it
+    has learned and its watched literals from one query to the next.
+    Queries can be asked under assumptions: sentences taken to be true
+    for that query only.
+    """
+
+    def __init__(self, *sentences):
+        self.solver = Solver()
+        self.encoder = Tseitin()
+        self.variables = dict()
+        self.sentences = []
+
+        # How many of the encoder's clauses the solver has been given
+        self.given = 0
+
+        for sentence in sentences:
+            self.add(sentence)
+
+    def __repr__(self):
+        sentences = ", ".join([str(sentence) for sentence in self.sentences])
+        return f"KnowledgeBase({sentences})"
+
+    def add(self, sentence):
+        """Adds a sentence to the knowledge base."""
+        Sentence.validate(sentence)
+        self.sentences.append(sentence)
+        self.encoder.require(sentence)
+        self.give_clauses()
+
+    def symbols(self):
+        """Returns a set of all symbols in the knowledge base."""
+        return set().union(*[sentence.symbols()
+                             for sentence in self.sentences])
+
+    def satisfiable(self, assumptions=()):
+        """
+        Checks if the knowledge base can be true with every sentence in
+        `assumptions` true too.
+        """
+        assumed = [self.literal(sentence) for sentence in assumptions]
+        self.give_clauses()
+        return self.solver.solve(assumed)
+
+    def entails(self, query, assumptions=()):
+        """
+        Checks if the knowledge base, with every sentence in
+        `assumptions` true, entails query.
+        """
+        return self.entailments([query], assumptions)[0]
+
+    def entailments(self, queries, assumptions=()):
+        """
+        Checks which queries the knowledge base, with every sentence in
+        `assumptions` true, entails, returning a list of True or False
+        for the queries in order.
+
+        A query is entailed if the solver can't make it false. Each
+        model found shows every query false in it to be not entailed,
+        not just the one being checked.
+        """
+        queries = list(queries)
+        literals = [self.literal(query) for query in queries]
+        assumed = [self.literal(sentence) for sentence in assumptions]
+        self.give_clauses()
+
+        entailed = [None] * len(queries)
+        for i in range(len(queries)):
+            if entailed[i] is not None:
+                continue
+            if self.solver.solve(assumed + [-literals[i]]):
+                model = self.solver.model
+                for j in range(i, len(queries)):
+                    literal = literals[j]
+                    if (entailed[j] is None
+                            and model[abs(literal)] != (literal > 0)):
+                        entailed[j] = False
+            else:
+                entailed[i] = True
+        return entailed
+
+    def literal(self, sentence):
+        """
+        Returns the solver literal that is true exactly when the
+        sentence is, defining it if need be.
+        """
+        Sentence.validate(sentence)
+        return self.number(self.encoder.literal(sentence))
+
+    def number(self, literal):
+        """Returns the solver literal for an encoder literal."""
+        name, value = literal
+        variable = self.variables.get(name)
+        if variable is None:
+            variable = self.variables[name] = self.solver.new_var()
+        return variable if value else -variable
+
+    def give_clauses(self):
+        """Gives the solver every clause the encoder has added since."""
+        clauses = self.encoder.clauses
+        while self.given < len(clauses):
+            self.solver.add_clause([self.number(literal)
+                                    for literal in clauses[self.given]])
+            self.given += 1
+
+
+def sat_check(knowledge, query):
+    """
+    Checks if knowledge base entails query by asking a SAT solver
+    whether knowledge and the negation of query can both be true.
+    """
+    return sat_entailments(knowledge, [query])[0]
+
+
+def entailments(knowledge, queries, backend="enumerate"):
+    """
+    Checks which of many queries the knowledge base entails, returning
+    a list of True or False for the queries in order. The knowledge base
+    is enumerated (or solved) once for all of them, using the named
+    backend from BATCH_BACKENDS. Backends in BACKENDS without a batch
+    version check the queries one at a time.
+    """
+    if backend not in BATCH_BACKENDS:
+        check = BACKENDS[backend]
+        return [check(knowledge, query) for query in queries]
+    return BATCH_BACKENDS[backend](knowledge, list(queries))
+
+
+def enumerate_entailments(knowledge, queries):
+    """
+    Checks which queries the knowledge base entails by trying every
+    model once: a query is not entailed as soon as some model of the
+    knowledge base makes it false.
+    """
+    symbols = sorted(set.union(knowledge.symbols(),
+                               *[query.symbols() for query in queries]))
+    shared = repeats_parts(knowledge, *queries)
+    pending = list(range(len(queries)))
+    for values in itertools.product([True, False], repeat=len(symbols)):
+        if not pending:
+            break
+        model = dict(zip(symbols, values))
+        cache = dict() if shared else None
+        if knowledge.evaluate(model, cache):
+            pending = [i for i in pending
+                       if queries[i].evaluate(model, cache)]
+    return entailed_only(pending, len(queries))
+
+
+def compiled_entailments(knowledge, queries):
+    """
+    Checks which queries the knowledge base entails like
+    enumerate_entailments, with every sentence compiled as in
+    compiled_check and the models counted through as integers.
+    """
+    symbols = sorted(set.union(knowledge.symbols(),
+                               *[query.symbols() for query in queries]))
+    bits = {name: i for i, name in enumerate(symbols)}
+    try:
+        possible = compile_sentence(knowledge, bits)
+        checks = [compile_sentence(query, bits) for query in queries]
+    except (SyntaxError, RecursionError, MemoryError):
+        return enumerate_entailments(knowledge, queries)
+    pending = list(range(len(queries)))
+    for m in filter(possible, range(2 ** len(symbols))):
+        pending = [i for i in pending if checks[i](m)]
+        if not pending:
+            break
+    return entailed_only(pending, len(queries))
+
+
+def numpy_entailments(knowledge, queries, chunk_bits=20):
+    """
+    Checks which queries the knowledge base entails by evaluating every
+    sentence over the whole truth table with NumPy, `2 ** chunk_bits`
+    models at a time.
+
+    Each sentence becomes a column of bits packed 64 models to a word, so
+    every connective is one bitwise operation over a chunk, and knowledge
+    entails a query if no chunk has a model where knowledge holds but
+    the query does not. Memory stays bounded by the chunk size.
+    """
+    import numpy as np
+
+    symbols = sorted(set.union(knowledge.symbols(),
+                               *[query.symbols() for query in queries]))
+    n = len(symbols)
+    bits = {name: i for i, name in enumerate(symbols)}
+
+    # Model m of a chunk is bit m % 64 of word m // 64, so the symbols
+    # numbered below 6 repeat the same pattern in every word,
+    # those below chunk_bits vary between words of a chunk,
+    # and the rest are constant within a chunk
+    chunk_bits = max(6, min(chunk_bits, n))
+    ones = np.uint64(0xFFFFFFFFFFFFFFFF)
+    zeros = np.uint64(0)
+    words = np.arange(2 ** (chunk_bits - 6), dtype=np.uint64)
+    within = [np.uint64(pattern) for pattern in (
+        0xAAAAAAAAAAAAAAAA, 0xCCCCCCCCCCCCCCCC, 0xF0F0F0F0F0F0F0F0,
+        0xFF00FF00FF00FF00, 0xFFFF0000FFFF0000, 0xFFFFFFFF00000000
+    )]
+    within.extend(
+        np.where((words >> np.uint64(i - 6)) & np.uint64(1), ones, zeros)
+        for i in range(6, chunk_bits)
+    )
+
+    # Below 6 symbols, the models past 2 ** n are not real and are masked
+    valid = np.uint64((1 << 2 ** n) - 1) if n < 6 else ones
+
+    pending = list(range(len(queries)))
+    for chunk in range(2 ** max(n - chunk_bits, 0)):
+        if not pending:
+            break
+        columns = within + [ones if chunk >> (i - chunk_bits) & 1 else zeros
+                            for i in range(chunk_bits, n)]
+        memo = dict()
+        possible = truth_table(knowledge, bits, columns, memo) & valid
+        pending = [
+            i for i in pending
+            if not np.any(possible
+                          & ~truth_table(queries[i], bits, columns, memo))
+        ]
+    return entailed_only(pending, len(queries))
+
+
+def sat_entailments(knowledge, queries):
+    """
+    Checks which queries the knowledge base entails with one SAT solver
+    holding it, as KnowledgeBase.entailments does.
+    """
+    return KnowledgeBase(knowledge).entailments(queries)
+
+
+def entailed_only(pending, n):
+    """Returns a list of `n` results, True for the indices in `pending`."""
+    entailed = [False] * n
+    for i in pending:
+        entailed[i] = True
+    return entailed
+
+
+def count_models(knowledge, symbols=()):
+    """
+    Returns the number of models of the knowledge base: assignments to
+    its symbols, and to any other symbol names in `symbols`, in which
+    it is true.
+
+    Rather than trying all 2 ** n models, the knowledge base's clauses
+    are counted as in #SAT solvers: by splitting them into components
+    that share no symbols (whose counts multiply), branching on one
+    symbol at a time with unit propagation, and caching the count of
+    every component seen, which lets knowledge bases with hundreds of
+    symbols be counted when they are loosely connected.
+    """
+    clauses, variables = numbered_clauses(knowledge, symbols)
+    return count_clauses(clauses, variables, dict())
+
+
+def truth_fractions(knowledge):
+    """
+    Returns a dict mapping each symbol of the knowledge base to the
+    fraction of its models in which that symbol is true.
+    """
+    clauses, variables = numbered_clauses(knowledge)
+    cache = dict()
+    total = count_clauses(clauses, variables, cache)
+    if total == 0:
+        raise ValueError("knowledge base has no models")
+    fractions = dict()
+    for name in knowledge.symbols():
+        fractions[name] = count_assuming(clauses, variables, variables[name],
+                                         cache) / total
+    return fractions
+
+
+def numbered_clauses(knowledge, symbols=()):
+    """
+    Returns the knowledge base's clauses as converted by tseitin(), as
+    frozensets of DIMACS-style literals, and the dict numbering its
+    symbols (and those in `symbols`) from 1, followed by Tseitin's
+    variables. Each model gives those variables exactly one value, so
+    counting over all of them counts the models of the knowledge base.
+    """
+    names = sorted(set.union(knowledge.symbols(), symbols))
+    variables = {name: i + 1 for i, name in enumerate(names)}
+    clauses = set()
+    for clause in tseitin(knowledge):
+        literals = set()
+        for name, value in clause:
+            variable = variables.setdefault(name, len(variables) + 1)
+            literals.add(variable if value else -variable)
+        clauses.add(frozenset(literals))
+    return frozenset(clauses), variables
+
+
+def count_clauses(clauses, variables, cache):
+    """
+    Returns the number of assignments to the `variables` (any
+    collection of them) that satisfy every clause.
+    """
+    free = len(variables) - len(clause_variables(clauses))
+    return component_count(clauses, cache) << free
+
+
+def count_assuming(clauses, variables, literal, cache):
+    """
+    Returns the number of assignments to the `variables` that satisfy
+    every clause and make `literal` true.
+    """
+    reduced, assigned = assume(clauses, literal)
+    if reduced is None:
+        return 0
+    free = len(variables) - len(assigned) - len(clause_variables(reduced))
+    return component_count(reduced, cache) << free
+
+
+def component_count(clauses, cache):
+    """
+    Returns the number of assignments to the variables appearing in the
+    clauses that satisfy them all, caching the count of each component.
+    """
+    if not clauses:
+        return 1
+    if frozenset() in clauses:
+        return 0
+    if clauses in cache:
+        return cache[clauses]
+
+    parts, occurrences = components(clauses)
+    if len(parts) > 1:
+        count = 1
+        for part in parts:
+            count *= component_count(part, cache)
+            if count == 0:
+                break
+    else:
+        # Branch on the variable in the most clauses
+        variable = max(occurrences, key=occurrences.get)
+        count = (count_assuming(clauses, occurrences, variable, cache)
+                 + count_assuming(clauses, occurrences, -variable, cache))
+    cache[clauses] = count
+    return count
+
+
+def assume(clauses, literal):
+    """
+    Returns the clauses left once `literal` and every literal it forces
+    through unit clauses are true, with the set of literals made true,
+    or None (and that set) if they contradict the clauses.
+    """
+    by_literal = dict()
+    for clause in clauses:
+        for other in clause:
+            by_literal.setdefault(other, []).append(clause)
+
+    # Clauses made true, and what is left of those shortened so far
+    satisfied = set()
+    shortened = dict()
+    true = {literal}
+    pending = [literal]
+    while pending:
+        literal = pending.pop()
+        satisfied.update(by_literal.get(literal, ()))
+        for clause in by_literal.get(-literal, ()):
+            if clause in satisfied:
+                continue
+            rest = shortened.get(clause, clause) - {-literal}
+            if not rest:
+                return None, true
+            shortened[clause] = rest
+            if len(rest) == 1:
+                unit = next(iter(rest))
+                if -unit in true:
+                    return None, true
+                if unit not in true:
+                    true.add(unit)
+                    pending.append(unit)
+    return frozenset(shortened.get(clause, clause) for clause in clauses
+                     if clause not in satisfied), true
+
+
+def components(clauses):
+    """
+    Splits clauses into groups that share no variables. Returns the
+    groups, and a dict of how many clauses each variable appears in.
+    """
+    by_variable = dict()
+    for clause in clauses:
+        for literal in clause:
+            by_variable.setdefault(abs(literal), []).append(clause)
+    occurrences = {variable: len(by_variable[variable])
+                   for variable in by_variable}
+
+    groups = []
+    seen = set()
+    for clause in clauses:
+        if clause in seen:
+            continue
+        seen.add(clause)
+        group = []
+        stack = [clause]
+        while stack:
+            clause = stack.pop()
+            group.append(clause)
+            for literal in clause:
+                for other in by_variable.pop(abs(literal), ()):
+                    if other not in seen:
+                        seen.add(other)
+                        stack.append(other)
+        groups.append(frozenset(group))
+    return groups, occurrences
+
+
+def clause_variables(clauses):
+    """Returns the set of variables appearing in the clauses."""
+    return {abs(literal) for clause in clauses for literal in clause}
+
+
+# Entailment backends selectable in model_check, by name
+BACKENDS = {
+    "enumerate": model_check,
+    "compiled": compiled_check,
+    "numpy": numpy_check,
+    "parallel": parallel_check,
+    "sat": sat_check
+}
+
+# Backends selectable in entailments, by name
+BATCH_BACKENDS = {
+    "enumerate": enumerate_entailments,
+    "compiled": compiled_entailments,
+    "numpy": numpy_entailments,
+    "sat": sat_entailments
+}
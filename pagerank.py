@@ -1,15 +1,36 @@
 import os
-import random
-import re
 import sys
 
+from linkgraph import (STATE, LinkGraph, crawl_graph, crawl_pages,
+                       link_graph, read_state, write_state)
+
 DAMPING = 0.85
 SAMPLES = 10000
 
+# Most random surfers sample_pagerank moves at once
+SURFERS = 1 << 16
+
+# Total change in ranks (L1 norm) below which iteration stops
+TOLERANCE = 1e-6
+
+# Most pages gauss_seidel updates at once, and fewest groups it splits
+# the pages into for that
+BLOCK = 1 << 12
+BLOCKS = 256
+
+# Iterations between extrapolations in aitken_iteration
+PERIOD = 10
+
 def main():
-    if len(sys.argv) != 2:
-        sys.exit("Usage: python pagerank.py corpus")
-    corpus = crawl(sys.argv[1])
+    if len(sys.argv) not in (2, 3) or sys.argv[2:] not in ([], ["--update"]):
+        sys.exit("Usage: python pagerank.py corpus [--update]")
+    if sys.argv[2:]:
+        ranks = update_pagerank(sys.argv[1], DAMPING)
+        print(f"PageRank Results from Updating")
+        for page in sorted(ranks):
+            print(f"  {page}: {ranks[page]:.4f}")
+        return
+    corpus = crawl_graph(sys.argv[1])
     ranks = sample_pagerank(corpus, DAMPING, SAMPLES)
     print(f"PageRank Results from Sampling (n = {SAMPLES})")
     for page in sorted(ranks):
@@ -25,26 +46,14 @@ def crawl(directory):
     Parse a directory of HTML pages and check for links to other pages.
     Return a dictionary where each key is a page, and values are
     a list of all other pages in the corpus that are linked to by the page.
-    """
-    pages = dict()
-
-    # Extract all links from HTML files
-    for filename in os.listdir(directory):
-        if not filename.endswith(".html"):
-            continue
-        with open(os.path.join(directory, filename)) as f:
-            contents = f.read()
-            links = re.findall(r"<a\s+(?:[^>]*?)href=\"([^\"]*)\"", contents)
-            pages[filename] = set(links) - {filename}
-
-    # Only include links to other pages in the corpus
-    for filename in pages:
-        pages[filename] = set(
-            link for link in pages[filename]
-            if link in pages
-        )
 
-    return pages
+    Pages in subdirectories are included too, as crawl_graph describes.
+    """
+    graph = crawl_graph(directory)
+    return {
+        page: set(graph.pages[q] for q in graph.links_from(p))
+        for p, page in enumerate(graph.pages)
+    }
 
 
 def transition_model(corpus, page, damping_factor):
@@ -70,44 +79,88 @@ def transition_model(corpus, page, damping_factor):
     return tr_model
 
 
-def sample_pagerank(corpus, damping_factor, n):
+def sample_pagerank(corpus, damping_factor, n, seed=None):
     """
-    Return PageRank values for each page by sampling `n` pages
+    Return PageRank values for each page by sampling about `n` pages
     according to transition model, starting with a page at random.
 
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    `corpus` may be a dictionary as returned by `crawl`, or a LinkGraph.
+    The same `seed` always gives the same samples.
     """
-    
-    t = 0
-    sample_dict = dict()
-    sample = random.choice(list(corpus.keys()))
-    
-    # Choose the next page according to the transition model
-    # and update that page's count along the way
-    while t <= n:
-        tr = transition_model(corpus, sample, damping_factor)
-        next_sample = random.choices(
-            list(tr.keys()), 
-            weights = list(tr.values()), 
-            k = 1)    # This function returns a list, not the element itself
-        if next_sample[0] in sample_dict.keys(): 
-            sample_dict[next_sample[0]] += 1
+    graph = corpus if isinstance(corpus, LinkGraph) else link_graph(corpus)
+    visits = random_surfers(graph, damping_factor, n, seed)
+    return dict(zip(graph.pages, (visits / visits.sum()).tolist()))
+
+
+def random_surfers(graph, damping_factor, n, seed=None, surfers=SURFERS):
+    """
+    Return how many times each page of a LinkGraph is visited, as a NumPy
+    array, by random surfers that visit about `n` pages between them.
+
+    Each surfer starts on a page chosen at random and, with probability
+    `damping_factor`, follows a random link, or else stops, since its next
+    page would be chosen at random just as a new surfer's is. A surfer on
+    a page with no links stops for the same reason. Up to `surfers` of
+    them move at once, each step drawing all their choices together.
+    Every surfer's visits are counted until it stops, which makes the
+    counts proportional to PageRank from the first step on.
+
+    With a `damping_factor` of 1 surfers would never stop, so a single
+    surfer visits `n` pages instead, as random_chain does.
+    """
+    import numpy as np
+
+    rng = np.random.default_rng(seed)
+    if damping_factor >= 1:
+        return random_chain(graph, n, rng)
+    size = len(graph)
+    offsets = np.frombuffer(graph.offsets, dtype=np.intc)
+    links = np.frombuffer(graph.links, dtype=np.intc)
+    degrees = np.diff(offsets)
+
+    # Surfers visit 1 / (1 - damping_factor) pages on average
+    remaining = max(1, round(n * (1 - damping_factor)))
+    visits = np.zeros(size, dtype=np.int64)
+    while remaining:
+        pages = rng.integers(size, size=min(remaining, surfers))
+        remaining -= len(pages)
+        while len(pages):
+            visits += np.bincount(pages, minlength=size)
+            follow = rng.random(len(pages)) < damping_factor
+            pages = pages[follow & (degrees[pages] > 0)]
+            pages = links[offsets[pages] + rng.integers(degrees[pages])]
+    return visits
+
+
+def random_chain(graph, n, rng):
+    """
+    Return how many times each page of a LinkGraph is visited, as a NumPy
+    array, by a single surfer that starts on a page chosen at random and
+    visits `n` pages, always following a random link, or going to a page
+    chosen at random from a page with no links.
+    """
+    import numpy as np
+
+    size = len(graph)
+    offsets, links = graph.offsets, graph.links
+    visits = np.zeros(size, dtype=np.int64)
+    page = int(rng.integers(size))
+    for choice in rng.random(max(1, n)).tolist():
+        visits[page] += 1
+        start, end = offsets[page], offsets[page + 1]
+        if start < end:
+            page = links[start + int(choice * (end - start))]
         else:
-            sample_dict[next_sample[0]] = 1
-        sample = next_sample[0]
-        t += 1
-        
-    
-    # Scale by n to get sample probability distribution
-    for i in sample_dict.keys():
-        sample_dict[i] = sample_dict[i]/n
-    
-    return sample_dict
+            page = int(choice * size)
+    return visits
 
 
-def iterate_pagerank(corpus, damping_factor):
+def iterate_pagerank(corpus, damping_factor, solver="jacobi",
+                     tolerance=TOLERANCE, **options):
     """
     Return PageRank values for each page by iteratively updating
     PageRank values until convergence.
@@ -115,51 +168,284 @@ def iterate_pagerank(corpus, damping_factor):
     Return a dictionary where keys are page names, and values are
     their estimated PageRank value (a value between 0 and 1). All
     PageRank values should sum to 1.
+
+    `corpus` may be a dictionary as returned by `crawl`, or a LinkGraph.
+    `solver` is the name of one of SOLVERS, which all stop once an
+    iteration changes the ranks by less than `tolerance` in total; any
+    other keyword arguments, such as `block` for gauss-seidel, are passed
+    on to it.
     """
-    
-    it_dict = dict()
-    
-    # Keep track of the differences of values between iterations
-    diff_dict = dict()
-    
-    # Initialize PageRank values in our dictionary
-    for p in corpus.keys():
-        it_dict[p] = 1/len(corpus)
-    
-    # Caculate the total probability of being on page p
-    # First makes list of all pages linking to p
-    def pagerank(p):
-        list_p = list()
-        for i in corpus.keys():
-            if p in corpus[i]:
-                list_p.append(i)
-        # Contribution of all the pages linking to p
-        k = 0
-        for i in list_p:
-            k += it_dict[i]/len(corpus[i])
-        new_pr = (1-damping_factor)/len(corpus) + damping_factor*k
-    
-        # Update differences dictionary by abosolute value 
-        diff_dict[p] = abs(new_pr - it_dict[p])
-        
-        # Update main dictionary
-        it_dict[p] = new_pr
-        
-    # Updates PageRank for each page in the corpus    
-    def update_pages(corpus):
-        for p in corpus.keys():
-            pagerank(p)
-    
-    # Check whether any differences exceed threshold
-    switch = True
-    while switch == True:
-        switch = False
-        update_pages(corpus)
-        for i in diff_dict.values():
-            if i > 0.001:
-                switch = True
-                
-    return it_dict
+    graph = corpus if isinstance(corpus, LinkGraph) else link_graph(corpus)
+    ranks, _ = SOLVERS[solver](graph, damping_factor, tolerance, **options)
+    return dict(zip(graph.pages, ranks.tolist()))
+
+
+def power_step(graph, damping_factor):
+    """
+    Return a function that takes the ranks of the pages of a LinkGraph,
+    as a NumPy array, and returns them after one step of power iteration.
+
+    The link matrix is kept in the graph's compressed sparse rows, so each
+    step takes time and memory linear in the number of links.
+    A page with no links is treated as linking to every page, itself
+    included, so its rank is spread evenly rather than lost.
+    """
+    import numpy as np
+
+    n = len(graph)
+    degrees = np.diff(np.frombuffer(graph.offsets, dtype=np.intc))
+    sources = np.repeat(np.arange(n, dtype=np.intc), degrees)
+    targets = np.frombuffer(graph.links, dtype=np.intc)
+    dangling = np.flatnonzero(degrees == 0)
+    share = damping_factor / np.maximum(degrees, 1)
+
+    def step(ranks):
+        teleport = (1 - damping_factor
+                    + damping_factor * ranks[dangling].sum()) / n
+        spread = (ranks * share)[sources]
+        return np.bincount(targets, weights=spread, minlength=n) + teleport
+
+    return step
+
+
+def power_iteration(graph, damping_factor, tolerance=TOLERANCE):
+    """
+    Return the PageRank of every page of a LinkGraph as a NumPy array,
+    by power iteration (Jacobi's method) from equal ranks until an
+    iteration changes the ranks by less than `tolerance` in total
+    (L1 norm), and the list of how much each iteration changed them.
+    """
+    import numpy as np
+
+    step = power_step(graph, damping_factor)
+    ranks = np.full(len(graph), 1 / len(graph))
+    residuals = []
+    while not residuals or residuals[-1] >= tolerance:
+        updated = step(ranks)
+        residuals.append(float(np.abs(updated - ranks).sum()))
+        ranks = updated
+    return ranks, residuals
+
+
+def gauss_seidel(graph, damping_factor, tolerance=TOLERANCE, block=None):
+    """
+    Return the PageRank of every page of a LinkGraph, and how much each
+    iteration changed the ranks, as power_iteration does, but by the
+    Gauss-Seidel method: each iteration updates the pages in order, each
+    from the latest ranks of the pages that link to it.
+
+    Pages are updated `block` at a time with NumPy, each page in a block
+    seeing the ranks from before the block. With `block` 1 this is plain
+    Gauss-Seidel, and with every page in one block it is power iteration.
+    By default there are at least BLOCKS blocks of at most BLOCK pages.
+    """
+    import numpy as np
+
+    n = len(graph)
+    if block is None:
+        block = max(1, min(BLOCK, n // BLOCKS))
+    degrees = np.diff(np.frombuffer(graph.offsets, dtype=np.intc))
+    sources = np.repeat(np.arange(n, dtype=np.intc), degrees)
+    targets = np.frombuffer(graph.links, dtype=np.intc)
+    dangling = degrees == 0
+    share = damping_factor / np.maximum(degrees, 1)
+
+    # Links sorted by the page they lead to, so that each block's
+    # incoming links are a slice, with the share of rank each passes on
+    # and the position in its block of the page it leads to
+    keys = np.sort(targets.astype(np.int64) * n + sources)
+    sources, targets = (keys % n).astype(np.intc), keys // n
+    bounds = np.searchsorted(targets, np.arange(0, n + block, block))
+    shares = share[sources]
+    positions = (targets % block).astype(np.intc)
+    del keys, targets
+
+    ranks = np.full(n, 1 / n)
+    residuals = []
+    while not residuals or residuals[-1] >= tolerance:
+        previous = ranks.copy()
+        lost = ranks[dangling].sum()
+        for i, first in enumerate(range(0, n, block)):
+            last = min(first + block, n)
+            links = slice(bounds[i], bounds[i + 1])
+            spread = ranks[sources[links]] * shares[links]
+            updated = np.bincount(
+                positions[links], weights=spread, minlength=last - first
+            ) + (1 - damping_factor + damping_factor * lost) / n
+            lost += (updated - ranks[first:last])[dangling[first:last]].sum()
+            ranks[first:last] = updated
+
+        # Unlike a step of power iteration, a sweep does not keep the
+        # total rank at 1, and left alone the error in the total would
+        # only shrink by about `damping_factor` each sweep
+        ranks /= ranks.sum()
+        residuals.append(float(np.abs(ranks - previous).sum()))
+    return ranks, residuals
+
+
+def aitken_iteration(graph, damping_factor, tolerance=TOLERANCE,
+                     period=PERIOD):
+    """
+    Return the PageRank of every page of a LinkGraph, and how much each
+    iteration changed the ranks, as power_iteration does, but every
+    `period` iterations replacing the ranks with what Aitken's
+    delta-squared process extrapolates from the last three iterates,
+    page by page. No page is given less than the rank teleporting alone
+    gives it, and the ranks are scaled to sum to 1 again.
+
+    If the iteration after an extrapolation changes the ranks by more
+    than the one before it did, the extrapolation is undone, and no
+    more are tried.
+    """
+    import numpy as np
+
+    n = len(graph)
+    step = power_step(graph, damping_factor)
+    iterates = [np.full(n, 1 / n)]
+    residuals = []
+    undo = None
+    while not residuals or residuals[-1] >= tolerance:
+        iterates = iterates[-2:] + [step(iterates[-1])]
+        residuals.append(float(np.abs(iterates[-1] - iterates[-2]).sum()))
+        if undo is not None:
+            if residuals[-1] > residuals[-2]:
+                iterates, period = [undo], None
+            undo = None
+        elif (period and len(residuals) % period == 0
+                and len(iterates) == 3 and residuals[-1] >= tolerance):
+            undo = iterates[-1]
+            ranks = np.maximum(aitken_extrapolation(*iterates),
+                               (1 - damping_factor) / n)
+            iterates = [ranks / ranks.sum()]
+    return iterates[-1], residuals
+
+
+def aitken_extrapolation(first, second, third):
+    """
+    Return the limit of iterates whose error shrinks geometrically, at
+    its own rate for each page, given the last three. Pages whose last
+    two changes are not getting smaller keep their latest rank.
+    """
+    import numpy as np
+
+    before, after = second - first, third - second
+    converging = np.abs(after) < np.abs(before)
+    correction = np.zeros_like(third)
+    np.divide(after ** 2, after - before, out=correction, where=converging)
+    return third - correction
+
+
+def update_pagerank(directory, damping_factor, workers=None):
+    """
+    Return PageRank values for each page of the corpus in `directory`,
+    as iterate_pagerank does, carrying over as much as possible from the
+    last call for the same directory.
+
+    The crawl and the ranks are saved in the directory between calls.
+    Only pages that are new or have changed since are parsed again, and
+    the saved ranks are brought up to date by push_pagerank.
+    """
+    filename = os.path.join(directory, STATE)
+    state = read_state(filename)
+    if state is None:
+        crawl = crawl_pages(directory, workers)
+        ranks, _ = power_iteration(crawl.graph, damping_factor)
+    else:
+        previous, saved = state
+        crawl = crawl_pages(directory, workers, previous)
+        start = carried_ranks(previous.graph, saved, crawl.graph)
+        ranks = push_pagerank(crawl.graph, start, damping_factor)
+    try:
+        write_state(crawl, ranks, filename)
+    except OSError:
+        pass
+    return dict(zip(crawl.graph.pages, ranks.tolist()))
+
+
+def carried_ranks(old, ranks, graph):
+    """
+    Return the ranks of the pages of LinkGraph `old` as a starting point
+    for the pages of `graph`, with pages that are new given the average
+    rank, scaled to sum to 1.
+    """
+    import numpy as np
+
+    ranks = np.frombuffer(ranks, dtype=float)
+    if old.pages != graph.pages:
+        index = {name: p for p, name in enumerate(old.pages)}
+        kept = np.array([index.get(name, -1) for name in graph.pages],
+                        dtype=np.intp)
+        carried = np.full(len(graph), 1 / len(graph))
+        carried[kept >= 0] = ranks[kept[kept >= 0]]
+        ranks = carried
+    return ranks / ranks.sum()
+
+
+def push_pagerank(graph, ranks, damping_factor, tolerance=TOLERANCE):
+    """
+    Return the PageRank of every page of a LinkGraph as a NumPy array,
+    starting from `ranks`, such as the ranks of an earlier version of the
+    graph, and stopping once they would change by less than `tolerance`
+    in total (L1 norm) in another step of power iteration.
+
+    A page's residual is how much more rank its links and teleporting
+    would give it than it has. Each round adds the residual of every page
+    where it is at least `tolerance / N` to the page's rank, and passes
+    it on along the page's links, so that after a small change to the
+    graph the work stays around the pages that it touched.
+    """
+    import numpy as np
+
+    n = len(graph)
+    offsets = np.frombuffer(graph.offsets, dtype=np.intc)
+    degrees = np.diff(offsets)
+    sources = np.repeat(np.arange(n, dtype=np.intc), degrees)
+    targets = np.frombuffer(graph.links, dtype=np.intc)
+    share = damping_factor / np.maximum(degrees, 1)
+
+    ranks = np.array(ranks, dtype=float)
+    teleport = (1 - damping_factor
+                + damping_factor * ranks[degrees == 0].sum()) / n
+    residual = np.bincount(targets, weights=(ranks * share)[sources],
+                           minlength=n) + teleport - ranks
+    while np.abs(residual).sum() >= tolerance:
+        pushed = np.flatnonzero(np.abs(residual) >= tolerance / n)
+        amounts = residual[pushed]
+        ranks[pushed] += amounts
+        residual[pushed] = 0
+
+        linked = degrees[pushed] > 0
+        counts = degrees[pushed[linked]]
+        edges = spans(offsets[pushed[linked]], counts)
+        residual += np.bincount(
+            targets[edges], minlength=n,
+            weights=np.repeat(amounts[linked] * share[pushed[linked]], counts)
+        )
+        residual += damping_factor * amounts[~linked].sum() / n
+
+    # Unlike a step of power iteration, pushing does not keep the total
+    # rank at 1 along the way, only in the limit
+    return ranks / ranks.sum()
+
+
+def spans(starts, counts):
+    """
+    Return the positions `starts[i]` to `starts[i] + counts[i] - 1` for
+    every i, one after the other, as a NumPy array.
+    """
+    import numpy as np
+
+    ends = np.cumsum(counts)
+    total = ends[-1] if len(ends) else 0
+    return np.repeat(starts - ends + counts, counts) + np.arange(total)
+
+
+# Solvers that iterate_pagerank can use, by name
+SOLVERS = {
+    "jacobi": power_iteration,
+    "gauss-seidel": gauss_seidel,
+    "aitken": aitken_iteration
+}
 
 
 if __name__ == "__main__":
@@ -1,3 +1,5 @@
+import random
+
 from logic import *
 
 AKnight = Symbol("A is a Knight")
@@ -75,6 +77,64 @@ knowledge3 = And(
 )
 
 
+def generate(n, depth=2, seed=None):
+    """
+    Returns the knowledge base of a random knights-and-knaves puzzle with
+    `n` speakers, each making one statement about the speakers nested up
+    to `depth` deep, and the list of its symbols, knights then knaves.
+
+    The speakers' kinds are picked first and each statement made true or
+    false to match, so the puzzle always has at least that solution.
+    """
+    rng = random.Random(seed)
+    names = [speaker(i) for i in range(n)]
+    knights = [Symbol(f"{name} is a Knight") for name in names]
+    knaves = [Symbol(f"{name} is a Knave") for name in names]
+    model = dict()
+    for knight, knave in zip(knights, knaves):
+        model[knight.name] = rng.random() < 0.5
+        model[knave.name] = not model[knight.name]
+
+    knowledge = And()
+    for knight, knave in zip(knights, knaves):
+        knowledge.add(Or(knight, knave))
+        knowledge.add(Not(And(knight, knave)))
+    for knight, knave in zip(knights, knaves):
+        said = statement(rng, knights, knaves, depth)
+        if said.evaluate(model) != model[knight.name]:
+            said = Not(said)
+        knowledge.add(Or(And(knight, said), And(knave, Not(said))))
+    return knowledge, knights + knaves
+
+
+def statement(rng, knights, knaves, depth):
+    """Returns a random statement about the speakers, `depth` deep at most."""
+    i = rng.randrange(len(knights))
+    if depth == 0 or rng.random() < 0.3:
+        return rng.choice([knights[i], knaves[i]])
+    first = statement(rng, knights, knaves, depth - 1)
+    second = statement(rng, knights, knaves, depth - 1)
+    return rng.choice([
+        Not(first),
+        And(first, second),
+        Or(first, second),
+        Implication(first, second),
+
+        # Speaker i saying the first, true exactly if i is a knight
+        Biconditional(knights[i], first)
+    ])
+
+
+def speaker(i):
+    """Returns the name of speaker `i`: A to Z, then AA, AB and so on."""
+    name = ""
+    i += 1
+    while i:
+        i, letter = divmod(i - 1, 26)
+        name = chr(ord("A") + letter) + name
+    return name
+
+
 def main():
     symbols = [AKnight, AKnave, BKnight, BKnave, CKnight, CKnave]
     puzzles = [
@@ -88,8 +148,9 @@ def main():
         if len(knowledge.conjuncts) == 0:
             print("    Not yet implemented.")
         else:
-            for symbol in symbols:
-                if model_check(knowledge, symbol):
+            results = entailments(knowledge, symbols)
+            for symbol, entailed in zip(symbols, results):
+                if entailed:
                     print(f"    {symbol}")
 
 
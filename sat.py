@@ -0,0 +1,286 @@
+class Solver():
+    """
+    Conflict-driven clause learning SAT solver.
+
+    Variables are positive integers and literals are DIMACS-style:
+    `v` for variable `v` true, `-v` for it false. Each clause watches its
+    first two literals, so unit propagation only visits clauses whose
+    watched literal just became false. Conflicts are analysed back to
+    their first unique implication point, and the learned clause is kept,
+    which makes later solve() calls (with other assumptions) cheaper too.
+    """
+
+    def __init__(self):
+        # Value of each variable: 1 true, -1 false, 0 unassigned
+        self.values = [0]
+        self.levels = [0]
+        self.reasons = [None]
+        self.activity = [0.0]
+        self.phases = [False]
+        self.watches = dict()
+        self.clauses = []
+        self.learned = []
+        self.trail = []
+        self.trail_limits = []
+        self.head = 0
+        self.increment = 1.0
+        self.conflicts = 0
+        self.decisions = 0
+        self.propagations = 0
+
+        # False once the clauses are unsatisfiable whatever the assumptions
+        self.ok = True
+
+    def new_var(self):
+        """Adds a variable and returns it."""
+        self.values.append(0)
+        self.levels.append(0)
+        self.reasons.append(None)
+        self.activity.append(0.0)
+        self.phases.append(False)
+        return len(self.values) - 1
+
+    def ensure_vars(self, n):
+        """Makes sure variables 1 to n exist."""
+        while len(self.values) <= n:
+            self.new_var()
+
+    def value(self, literal):
+        """Returns 1 if a literal is true, -1 if false, 0 if unassigned."""
+        value = self.values[abs(literal)]
+        return value if literal > 0 else -value
+
+    def add_clause(self, literals):
+        """
+        Adds a clause, a list of literals.
+        Returns False if the clauses have become unsatisfiable.
+        """
+        if not self.ok:
+            return False
+        self.cancel_until(0)
+        self.ensure_vars(max((abs(literal) for literal in literals),
+                             default=0))
+
+        # Drop duplicates and literals already false, and skip clauses
+        # that are tautologies or already true
+        clause = []
+        for literal in literals:
+            value = self.value(literal)
+            if value == 1 or -literal in clause:
+                return True
+            if value == 0 and literal not in clause:
+                clause.append(literal)
+
+        if not clause:
+            self.ok = False
+        elif len(clause) == 1:
+            self.assign(clause[0], None)
+            self.ok = self.propagate() is None
+        else:
+            self.clauses.append(clause)
+            self.watch(clause)
+        return self.ok
+
+    def watch(self, clause):
+        for literal in clause[:2]:
+            self.watches.setdefault(literal, []).append(clause)
+
+    def assign(self, literal, reason):
+        variable = abs(literal)
+        self.values[variable] = 1 if literal > 0 else -1
+        self.levels[variable] = len(self.trail_limits)
+        self.reasons[variable] = reason
+        self.trail.append(literal)
+
+    def propagate(self):
+        """
+        Propagates every assignment not yet propagated.
+        Returns a conflicting clause, or None.
+        """
+        values = self.values
+        while self.head < len(self.trail):
+            literal = self.trail[self.head]
+            self.head += 1
+            self.propagations += 1
+            false = -literal
+            watching = self.watches.get(false, [])
+            kept = []
+            conflict = None
+            for i, clause in enumerate(watching):
+                if conflict is not None:
+                    kept.extend(watching[i:])
+                    break
+
+                # Keep the false literal in second place
+                if clause[0] == false:
+                    clause[0], clause[1] = clause[1], false
+                first = clause[0]
+                value = values[abs(first)]
+                if (value if first > 0 else -value) == 1:
+                    kept.append(clause)
+                    continue
+
+                # Look for another literal to watch
+                for j in range(2, len(clause)):
+                    other = clause[j]
+                    value = values[abs(other)]
+                    if (value if other > 0 else -value) != -1:
+                        clause[1], clause[j] = other, false
+                        self.watches.setdefault(other, []).append(clause)
+                        break
+                else:
+                    kept.append(clause)
+                    value = values[abs(first)]
+                    if (value if first > 0 else -value) == -1:
+                        conflict = clause
+                    else:
+                        self.assign(first, clause)
+            self.watches[false] = kept
+            if conflict is not None:
+                return conflict
+        return None
+
+    def analyze(self, conflict):
+        """
+        Derives a learned clause from a conflict, with the literal
+        asserted after backjumping first. Returns it and the level
+        to backjump to.
+        """
+        level = len(self.trail_limits)
+        seen = set()
+        learned = [None]
+        pending = 0
+        literal = None
+        index = len(self.trail) - 1
+        clause = conflict
+        while True:
+            for other in clause:
+                if other == literal:
+                    continue
+                variable = abs(other)
+                if variable in seen or self.levels[variable] == 0:
+                    continue
+                seen.add(variable)
+                self.bump(variable)
+                if self.levels[variable] == level:
+                    pending += 1
+                else:
+                    learned.append(other)
+
+            # Walk back along the trail to the next literal to resolve on
+            while abs(self.trail[index]) not in seen:
+                index -= 1
+            literal = self.trail[index]
+            index -= 1
+            pending -= 1
+            if pending == 0:
+                break
+            clause = self.reasons[abs(literal)]
+
+        learned[0] = -literal
+        if len(learned) == 1:
+            return learned, 0
+
+        # Watch the literal from the deepest remaining level second
+        deepest = max(range(1, len(learned)),
+                      key=lambda i: self.levels[abs(learned[i])])
+        learned[1], learned[deepest] = learned[deepest], learned[1]
+        return learned, self.levels[abs(learned[1])]
+
+    def bump(self, variable):
+        self.activity[variable] += self.increment
+        if self.activity[variable] > 1e100:
+            self.activity = [activity * 1e-100 for activity in self.activity]
+            self.increment *= 1e-100
+
+    def cancel_until(self, level):
+        """Undoes every assignment made above a decision level."""
+        if len(self.trail_limits) <= level:
+            return
+        start = self.trail_limits[level]
+        for literal in self.trail[start:]:
+            variable = abs(literal)
+            self.phases[variable] = literal > 0
+            self.values[variable] = 0
+            self.reasons[variable] = None
+        del self.trail[start:]
+        del self.trail_limits[level:]
+        self.head = min(self.head, start)
+
+    def pick(self):
+        """Returns the unassigned variable with the highest activity."""
+        best = None
+        best_activity = -1.0
+        values = self.values
+        activity = self.activity
+        for variable in range(1, len(values)):
+            if values[variable] == 0 and activity[variable] > best_activity:
+                best = variable
+                best_activity = activity[variable]
+        return best
+
+    def solve(self, assumptions=()):
+        """
+        Returns True if the clauses are satisfiable with every literal in
+        `assumptions` true, and False if not. Assumptions only hold for
+        this call, while clauses learned along the way are kept.
+        """
+        if not self.ok:
+            return False
+        self.ensure_vars(max((abs(literal) for literal in assumptions),
+                             default=0))
+        self.cancel_until(0)
+        if self.propagate() is not None:
+            self.ok = False
+            return False
+
+        restart = 100
+        conflicts = 0
+        while True:
+            conflict = self.propagate()
+            if conflict is not None:
+                self.conflicts += 1
+                conflicts += 1
+                if not self.trail_limits:
+                    self.ok = False
+                    return False
+                learned, level = self.analyze(conflict)
+                self.cancel_until(level)
+                if len(learned) == 1:
+                    self.assign(learned[0], None)
+                else:
+                    self.learned.append(learned)
+                    self.watch(learned)
+                    self.assign(learned[0], learned)
+                self.increment /= 0.95
+                continue
+
+            # Restart now and then, keeping what was learned
+            if conflicts >= restart:
+                conflicts = 0
+                restart = int(restart * 1.5)
+                self.cancel_until(0)
+                continue
+
+            # Assumptions are decided first, one per decision level
+            literal = None
+            while len(self.trail_limits) < len(assumptions):
+                assumption = assumptions[len(self.trail_limits)]
+                value = self.value(assumption)
+                if value == -1:
+                    self.cancel_until(0)
+                    return False
+                self.trail_limits.append(len(self.trail))
+                if value == 0:
+                    literal = assumption
+                    break
+            if literal is None:
+                variable = self.pick()
+                if variable is None:
+                    self.model = [value == 1 for value in self.values]
+                    self.cancel_until(0)
+                    return True
+                self.decisions += 1
+                self.trail_limits.append(len(self.trail))
+                literal = variable if self.phases[variable] else -variable
+            self.assign(literal, None)
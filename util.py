@@ -1,3 +1,9 @@
+import json
+import time
+import tracemalloc
+from collections import deque
+
+
 class Node():
     def __init__(self, state, parent, action):
         self.state = state
@@ -7,13 +13,18 @@ class Node():
 
 class StackFrontier():
     def __init__(self):
-        self.frontier = []
+        self.frontier = deque()
+
+        # Counts how many nodes in the frontier hold each state,
+        # so membership tests don't have to scan the whole frontier
+        self.states = dict()
 
     def add(self, node):
         self.frontier.append(node)
+        self.states[node.state] = self.states.get(node.state, 0) + 1
 
     def contains_state(self, state):
-        return any(node.state == state for node in self.frontier)
+        return state in self.states
 
     def empty(self):
         return len(self.frontier) == 0
@@ -22,10 +33,18 @@ class StackFrontier():
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[-1]
-            self.frontier = self.frontier[:-1]
+            node = self.frontier.pop()
+            self.forget(node)
             return node
 
+    def forget(self, node):
+        """Drops one occurrence of a removed node's state from the index."""
+        count = self.states[node.state] - 1
+        if count:
+            self.states[node.state] = count
+        else:
+            del self.states[node.state]
+
 
 class QueueFrontier(StackFrontier):
 
@@ -33,6 +52,81 @@ class QueueFrontier(StackFrontier):
         if self.empty():
             raise Exception("empty frontier")
         else:
-            node = self.frontier[0]
-            self.frontier = self.frontier[1:]
+            node = self.frontier.popleft()
+            self.forget(node)
             return node
+
+
+class SearchStats():
+    """
+    Opt-in measurements of one search, filled in by a search that is
+    given an instance: nodes expanded, the frontier's high-water mark,
+    how many states were explored (reached), seconds spent in each phase,
+    and with `trace_memory` the peak memory allocated while searching.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.expanded = 0
+        self.frontier_peak = 0
+        self.explored = 0
+        self.phases = dict()
+        self.peak_memory = None
+        self.trace_memory = trace_memory
+        self.last = None
+        self.tracing = False
+
+    def start(self):
+        """Starts timing (and, if asked, tracing memory for) a search."""
+        if self.trace_memory:
+            self.tracing = not tracemalloc.is_tracing()
+            if self.tracing:
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        self.last = time.perf_counter()
+
+    def mark(self, phase):
+        """Ends the current phase, naming it, and starts the next one."""
+        now = time.perf_counter()
+        self.phases[phase] = self.phases.get(phase, 0) + now - self.last
+        self.last = now
+
+    def stop(self):
+        """Stops tracing memory, recording the peak."""
+        if self.trace_memory:
+            self.peak_memory = tracemalloc.get_traced_memory()[1]
+            if self.tracing:
+                tracemalloc.stop()
+                self.tracing = False
+
+    def frontier_size(self, size):
+        """Records a frontier size, keeping the largest seen."""
+        if size > self.frontier_peak:
+            self.frontier_peak = size
+
+    def as_dict(self):
+        return {
+            "expanded": self.expanded,
+            "frontier_peak": self.frontier_peak,
+            "explored": self.explored,
+            "phases": dict(self.phases),
+            "peak_memory": self.peak_memory
+        }
+
+    def to_json(self):
+        return json.dumps(self.as_dict())
+
+
+class InstrumentedStackFrontier(StackFrontier):
+    """A StackFrontier recording its high-water mark in a SearchStats."""
+
+    def __init__(self, stats):
+        super().__init__()
+        self.stats = stats
+
+    def add(self, node):
+        super().add(node)
+        self.stats.frontier_size(len(self.frontier))
+
+
+class InstrumentedQueueFrontier(InstrumentedStackFrontier, QueueFrontier):
+    """A QueueFrontier recording its high-water mark in a SearchStats."""